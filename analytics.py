@@ -0,0 +1,218 @@
+import os
+from functools import lru_cache
+from collections import namedtuple
+from augments import FirstAugment, SecondAugment
+
+# Every "btlAtelSetAbility" site of the corpus, one row per site across the arrays
+# "first_augs" and "second_augs" are uint32 bitfields, "units" the unit numbers and "file_ids" index "paths",
+# the paths of the target files relative to the input folder
+SiteArrays = namedtuple("SiteArrays", ["first_augs", "second_augs", "units", "file_ids", "paths"])
+
+# The 64 augment bits as the columns of "bit_matrix" and the rows and columns of "co_occurrence":
+# the "FirstAugment" bits then the "SecondAugment" bits, each from the highest bit to the lowest like the enums
+augment_columns = [FirstAugment(1 << bit) for bit in range(31, -1, -1)] + [SecondAugment(1 << bit) for bit in range(31, -1, -1)]
+
+# Sites "co_occurrence" multiplies at once, 64 bytes each as bits and 256 as float32
+default_chunk_size = 1 << 16
+
+# NumPy is only needed here, so the rest of the tool runs without it
+def import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError("Analytics need NumPy, install it with \"pip install numpy\"")
+    return numpy
+
+# Scans every target file of the input folder for its sites
+def load_sites(input_folder, target_filename):
+    from main import collect_target_files, map_file, convert_hex_to_dec
+    from scanner import scan_entries
+
+    numpy = import_numpy()
+    first_augs = []
+    second_augs = []
+    units = []
+    file_ids = []
+    paths = []
+
+    for source_path, relative_path in collect_target_files(input_folder, target_filename):
+        file_id = len(paths)
+        paths.append(relative_path.replace(os.sep, "/"))
+        with open(source_path, 'rb') as file:
+            source_map = map_file(file)
+            if source_map is None:
+                continue
+            try:
+                for entry in scan_entries(source_map):
+                    for set_ability in entry.abilities:
+                        first_augs.append(convert_hex_to_dec(set_ability.first_arg))
+                        second_augs.append(convert_hex_to_dec(set_ability.second_arg))
+                        units.append(set_ability.unit)
+                        file_ids.append(file_id)
+            finally:
+                source_map.close()
+
+    return SiteArrays(numpy.array(first_augs, dtype=numpy.uint32), numpy.array(second_augs, dtype=numpy.uint32),
+                      numpy.array(units, dtype=numpy.int64), numpy.array(file_ids, dtype=numpy.int64), paths)
+
+# The sites already in the SQLite index of "site_index", without reading the game files
+def load_sites_from_index(connection):
+    numpy = import_numpy()
+
+    paths = []
+    file_ids = {}
+    for file_id, path in connection.execute("SELECT id, path FROM files ORDER BY path"):
+        file_ids[file_id] = len(paths)
+        paths.append(path.replace(os.sep, "/"))
+
+    rows = connection.execute("SELECT sites.first_augs, sites.second_augs, sites.unit, sites.file_id "
+                              "FROM sites JOIN files ON files.id = sites.file_id ORDER BY files.path, sites.start").fetchall()
+    columns = numpy.array(rows, dtype=numpy.int64).reshape(-1, 4)
+    renumbered_ids = numpy.array([file_ids[file_id] for file_id in columns[:, 3]], dtype=numpy.int64)
+
+    return SiteArrays(columns[:, 0].astype(numpy.uint32), columns[:, 1].astype(numpy.uint32), columns[:, 2], renumbered_ids, paths)
+
+# The bits of the sites as a (sites, 64) uint8 matrix of 0 and 1, in the order of "augment_columns"
+def bit_matrix(first_augs, second_augs):
+    numpy = import_numpy()
+    # Big-endian bytes unpack from the highest bit down, the same order as "augment_columns"
+    first_bits = numpy.unpackbits(first_augs.astype(">u4").view(numpy.uint8)).reshape(-1, 32)
+    second_bits = numpy.unpackbits(second_augs.astype(">u4").view(numpy.uint8)).reshape(-1, 32)
+    return numpy.concatenate((first_bits, second_bits), axis=1)
+
+# "bit_matrix" of at most "chunk_size" sites at a time, so big corpora never need all of it in memory
+def bit_chunks(first_augs, second_augs, chunk_size=default_chunk_size):
+    for start in range(0, len(first_augs), chunk_size):
+        yield bit_matrix(first_augs[start:start + chunk_size], second_augs[start:start + chunk_size])
+
+# For each 16-bit value, its bits from the highest to the lowest, as a (65536, 16) matrix
+# In float64 so multiplying by it goes through BLAS, which is exact for any count below 2^53
+@lru_cache(maxsize=None)
+def half_word_bits():
+    numpy = import_numpy()
+    return numpy.unpackbits(numpy.arange(1 << 16, dtype=">u2").view(numpy.uint8).reshape(-1, 2), axis=1).astype(numpy.float64)
+
+# How many of the uint32 "bitfields" have each bit, from the highest to the lowest
+# Histograms of both 16-bit halves give every bit count with a single pass over the bitfields each
+def bit_counts(bitfields):
+    numpy = import_numpy()
+    table = half_word_bits()
+    high_counts = numpy.bincount(bitfields >> 16, minlength=1 << 16) @ table
+    low_counts = numpy.bincount(bitfields & 0xffff, minlength=1 << 16) @ table
+    return numpy.concatenate((high_counts, low_counts)).astype(numpy.int64)
+
+# How many sites have each augment, in the order of "augment_columns"
+def augment_counts(sites):
+    return import_numpy().concatenate((bit_counts(sites.first_augs), bit_counts(sites.second_augs)))
+
+# How many sites have each pair of augments, a 64 x 64 matrix in the order of "augment_columns" whose diagonal is "augment_counts"
+# Each chunk is a single matrix product, float32 counts exactly up to 2^24 which is more than a chunk has
+def co_occurrence(sites, chunk_size=default_chunk_size):
+    numpy = import_numpy()
+    chunk_size = min(chunk_size, 1 << 24)
+    matrix = numpy.zeros((len(augment_columns), len(augment_columns)), dtype=numpy.int64)
+    for bits in bit_chunks(sites.first_augs, sites.second_augs, chunk_size):
+        bits = bits.astype(numpy.float32)
+        matrix += (bits.T @ bits).astype(numpy.int64)
+    return matrix
+
+# Which sites each operation of "plan" (an "EditPlan") applies to, matching paths like "EditPlan.for_path"
+# None for the operations that apply to every site, a boolean array for the others
+def operation_site_masks(sites, plan):
+    from fnmatch import fnmatchcase
+
+    numpy = import_numpy()
+    site_masks = []
+    for operation in plan.operations:
+        applies = None
+        if operation.paths is not None:
+            matching_files = numpy.array([any(fnmatchcase(path, pattern) for pattern in operation.paths) for path in sites.paths], dtype=bool)
+            applies = matching_files[sites.file_ids]
+        if operation.units is not None:
+            # The ranges are sorted and apart, so each unit can only be in the last range starting at or before it
+            firsts = numpy.array([first for first, _ in operation.units], dtype=numpy.int64)
+            lasts = numpy.array([last for _, last in operation.units], dtype=numpy.int64)
+            range_index = numpy.searchsorted(firsts, sites.units, side="right") - 1
+            matching_units = (range_index >= 0) & (sites.units <= lasts[numpy.maximum(range_index, 0)])
+            applies = matching_units if applies is None else applies & matching_units
+        site_masks.append(applies)
+    return site_masks
+
+# The augments of every site after applying "plan", the operations in order like the edit composes them
+# The masks are spread over the sites by multiplying them with the boolean arrays, which is much faster than indexing with them
+def apply_plan(sites, plan):
+    numpy = import_numpy()
+    first_augs = sites.first_augs.copy()
+    second_augs = sites.second_augs.copy()
+
+    for operation, applies in zip(plan.operations, operation_site_masks(sites, plan)):
+        for augs, mask in ((first_augs, operation.first_mask), (second_augs, operation.second_mask)):
+            if not mask:
+                continue
+            site_mask = numpy.uint32(mask) if applies is None else applies.astype(numpy.uint32) * numpy.uint32(mask)
+            if operation.action == "add":
+                augs |= site_mask
+            else:
+                augs &= ~site_mask
+
+    return first_augs, second_augs
+
+# What applying "plan" would do to the corpus: how many sites, units and files would change,
+# and how many sites would gain and lose each augment, in the order of "augment_columns"
+# Like "site_index.find_units_with", units are counted by number across all files
+# Only the bitfields count, sites whose arguments would just be written differently aren't changed here
+def mask_impact(sites, plan):
+    numpy = import_numpy()
+    first_augs, second_augs = apply_plan(sites, plan)
+    changed = (first_augs != sites.first_augs) | (second_augs != sites.second_augs)
+
+    gained = numpy.concatenate((bit_counts(first_augs & ~sites.first_augs), bit_counts(second_augs & ~sites.second_augs)))
+    lost = numpy.concatenate((bit_counts(sites.first_augs & ~first_augs), bit_counts(sites.second_augs & ~second_augs)))
+
+    return {
+        "sites": int(len(first_augs)),
+        "sites_changed": int(numpy.count_nonzero(changed)),
+        "units_changed": count_distinct(sites.units[changed]),
+        "files_changed": count_distinct(sites.file_ids[changed]),
+        "gained": gained,
+        "lost": lost
+    }
+
+# How many different numbers there are in an array of unit numbers or file ids, which are never negative
+def count_distinct(numbers):
+    numpy = import_numpy()
+    return int(numpy.count_nonzero(numpy.bincount(numbers))) if len(numbers) else 0
+
+# Counts by augment name, without the augments no site has
+def counts_by_name(counts):
+    return {aug_enum.name: int(count) for aug_enum, count in zip(augment_columns, counts) if count}
+
+# The "top" pairs of different augments found together the most, as (first name, second name, sites)
+def top_pairs(matrix, top=10):
+    numpy = import_numpy()
+    rows, columns = numpy.triu_indices(len(augment_columns), k=1)
+    pair_counts = matrix[rows, columns]
+    order = numpy.argsort(pair_counts, kind="stable")[::-1][:top]
+    return [(augment_columns[rows[index]].name, augment_columns[columns[index]].name, int(pair_counts[index]))
+            for index in order if pair_counts[index]]
+
+# Everything above for a corpus, as plain types ready for JSON, the impact only when a plan is given
+def analyze(sites, plan=None, top=10):
+    counts = augment_counts(sites)
+    matrix = co_occurrence(sites)
+
+    report = {
+        "sites": int(len(sites.first_augs)),
+        "files": len(sites.paths),
+        "units": count_distinct(sites.units),
+        "augments": counts_by_name(counts),
+        "pairs": top_pairs(matrix, top)
+    }
+
+    if plan is not None:
+        impact = mask_impact(sites, plan)
+        impact["gained"] = counts_by_name(impact["gained"])
+        impact["lost"] = counts_by_name(impact["lost"])
+        report["impact"] = impact
+
+    return report
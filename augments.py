@@ -1,4 +1,6 @@
 from enum import Enum
+from functools import lru_cache
+from collections import namedtuple
 
 class FirstAugment(Enum):
     STABILITY =                 0x8000_0000 # Null Knockback
@@ -67,3 +69,136 @@ class SecondAugment(Enum):
     BATTLE_LORE_9 =             0x0000_0004
     BATTLE_LORE_10 =            0x0000_0002
     BATTLE_LORE_11 =            0x0000_0001
+
+# What each augment does, shown as the tooltip of its checkbox
+augment_tooltips = {
+    "STABILITY": "Prevents Knockback.",
+    "SAFETY": "Prevents Instant Death, Warp and the like.",
+    "ACCURACY_BOOST": "Improves chance to hit. (Ignore/Null Evade)",
+    "SHIELD_BOOST": "Improves chance to block with a shield",
+    "EVASION_BOOST": "Improvse chance of avoiding attacks.",
+    "LAST_STAND": "Increases defense when HP Critical.",
+    "COUNTER": "When attacked, automatically counter with weapon in hand. (Enables Counter)",
+    "COUNTER_BOOST": "Improves chance to counter. (Gengi Gloves Effect)",
+    "SPELLBREAKER": "Increases magick power when HP Critical.",
+    "BRAWLER": "Increases attack power when fighting empty-handed.",
+    "ADRENALINE": "Increases strength when HP Critical.",
+    "FOCUS": "Increases strength when HP is full.",
+    "LOBBYING": "Convert all license points earned to gil. (Cat Ear Hood Effect)",
+    "COMBO_BOOST": "Improves chance of scoring multiple hits.",
+    "ITEM_BOOST": "Improves potency of restorative items and fangs. (Pheasant Netsuke Effect)",
+    "MEDICINE_REVERSE": "Reverses effects of restorative items such as potions. (Nihopalaoa Effect)",
+    "WEATHERPROOF": "Nullifies weather and terrain effects. (Agate Ring Effect)",
+    "THIEVERY": "Enables the theft of superior and rare items. (Thief Cuffs Effect)",
+    "SABOTEUR": "Improves chance to strike with magicks. (Ignore/Null Vit | Indigo Pendant Effect)",
+    "MAGICK_LORE_1": "Increases magick potency.",
+    "WARMAGE": "Gain MP after dealing magick damage.",
+    "MARTYR": "Gain MP after taking damage.",
+    "MAGICK_LORE_2": "Increases magick potency.",
+    "HEADSMAN": "Gain MP after defeating a foe.",
+    "MAGICK_LORE_3": "Increases magick potency.",
+    "TREASURE_HUNTER": "Search the deepest recesses of chests, coffers, and the like. (Diamond Armlet Effect)",
+    "MAGICK_LORE_4": "Increases magick potency.",
+    "DOUBLE_EXP": "Doubles EXP earned. (Embroidered Tipped Effect)",
+    "DOUBLE_LP": "Doubles license points earned. (Golden Amulet Effect)",
+    "NO_EXP": "Reduces EXP earned to 0. (Firefly Effect)",
+    "SPELLBOUND": "Increases duration of status effects.",
+    "PIERCING_MAGICK": "Magicks will not bounce off targets with Reflect status. (Opal Ring Effect)",
+    "OFFERING": "Enables casting of magicks with gil, rather than MP. (Turtleshell Choker Effect)",
+    "MUFFLE": "Avoid detection based on sound and magick.",
+    "LIFE_CLOAK": "Avoid detection based on low HP.",
+    "BATTLE_LORE_1": "Increases physical attack damage.",
+    "PARSIMONY": "Reduces MP costs by half.",
+    "TREAD_LIGHTLY": "Move safely past traps. (Steel Polyens Effect)",
+    "UNUSED": "",
+    "EMPTINESS": "Reduces max MP to 0.",
+    "RESIST_PIERCE_DAMAGE": "Ignores the piercing effects of Guns and the like.",
+    "ANTI_LIBRA": "Hides user's vital information from the effect of Libra.",
+    "BATTLE_LORE_2": "Increases physical attack damage.",
+    "BATTLE_LORE_3": "Increases physical attack damage.",
+    "BATTLE_LORE_4": "Increases physical attack damage.",
+    "BATTLE_LORE_5": "Increases physical attack damage.",
+    "BATTLE_LORE_6": "Increases physical attack damage.",
+    "BATTLE_LORE_7": "Increases physical attack damage.",
+    "STONESKIN": "Reduces damage taken by 30%.",
+    "ATTACK_BOOST": "Increases Attack damage by 20%.",
+    "DOUBLE_EDGED": "Increases Attack damage by 50% and user receives damage equal to each Attack.",
+    "SPELLSPRING": "Reduces MP costs to 0.",
+    "ELEMENTAL_SHIFT": "User gains one elemental weakness and absorbs all others.",
+    "CELERITY": "Reduces Attack charge time to 0.",
+    "SWIFT_CAST": "Reduces Magick charge time to 0.",
+    "ATTACK_IMMUNITY": "User becomes immune to attacks.",
+    "MAGIC_IMMUNITY": "User becomes immune to magicks.",
+    "STATUS_IMMUNITY": "User becomes immune to statuses.",
+    "DAMAGE_SPIKES": "Returns 5% of all damage received to user's attackers.",
+    "SUICIDAL": "Compels nearby allies to use Self-Destruct.",
+    "BATTLE_LORE_8": "Increases physical attack damage.",
+    "BATTLE_LORE_9": "Increases physical attack damage.",
+    "BATTLE_LORE_10": "Increases physical attack damage.",
+    "BATTLE_LORE_11": "Increases physical attack damage."
+}
+
+# Everything known about an augment, "argument" is "first" or "second" for the "btlAtelSetAbility" argument it's a bit of
+AugmentInfo = namedtuple("AugmentInfo", ["name", "aug_enum", "argument", "value", "tooltip"])
+
+# Every augment by name, "FirstAugment" members first and each enum in its declared order, which is the order of the checkboxes
+# Names are unique across both enums, so a selection of names maps straight to its bits
+augment_registry = {aug_enum.name: AugmentInfo(aug_enum.name, aug_enum, argument, aug_enum.value, augment_tooltips.get(aug_enum.name, "No tooltip available."))
+                    for aug_enums, argument in ((FirstAugment, "first"), (SecondAugment, "second")) for aug_enum in aug_enums}
+
+# The "AugmentInfo" of the augment with that name
+def augment_info(aug_name):
+    info = augment_registry.get(aug_name)
+    if info is None:
+        raise ValueError(f"Unknown augment: {aug_name}")
+    return info
+
+# The "FirstAugment" or "SecondAugment" member with that name
+def augment_from_name(aug_name):
+    return augment_info(aug_name).aug_enum
+
+# First and second argument bits of augments selected by name, like the checkboxes of the window or the names on the command line
+def selection_masks(aug_names):
+    first_mask = 0
+    second_mask = 0
+    for aug_name in aug_names:
+        info = augment_info(aug_name)
+        if info.argument == "first":
+            first_mask |= info.value
+        else:
+            second_mask |= info.value
+    return first_mask, second_mask
+
+# First and second argument bits of a mix of "FirstAugment" and "SecondAugment" members
+def augment_masks(aug_enums):
+    first_mask = 0
+    second_mask = 0
+    for aug_enum in aug_enums:
+        if isinstance(aug_enum, FirstAugment):
+            first_mask |= aug_enum.value
+        else:
+            second_mask |= aug_enum.value
+    return first_mask, second_mask
+
+# For each byte of a 32-bit bitfield, most significant first, the names of the augments set by each of its 256 values
+# Both enums are declared from the highest bit to the lowest, so joining the bytes in order keeps the enum order
+def build_byte_tables(aug_enums):
+    tables = []
+    for shift in (24, 16, 8, 0):
+        byte_mask = 0xff << shift
+        byte_augments = [(f'{aug_enum.name} ({hex(aug_enum.value)})', aug_enum.value >> shift)
+                         for aug_enum in aug_enums if aug_enum.value & byte_mask == aug_enum.value]
+        tables.append([tuple(name for name, value in byte_augments if byte & value == value) for byte in range(256)])
+    return tables
+
+# Built the first time they're needed, so importing this module stays cheap
+augment_byte_tables = {}
+
+# Names of the augments contained in "augs", like "SAFETY (0x40000000)", in enum order
+# The same few bitfields repeat all over the game files, so whole values are cached too
+@lru_cache(maxsize=4096)
+def decode_augments(augs, aug_enums):
+    tables = augment_byte_tables.get(aug_enums)
+    if tables is None:
+        tables = augment_byte_tables[aug_enums] = build_byte_tables(aug_enums)
+    return tables[0][(augs >> 24) & 0xff] + tables[1][(augs >> 16) & 0xff] + tables[2][(augs >> 8) & 0xff] + tables[3][augs & 0xff]
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from plan import EditPlan, PlanOperation, parse_units
+from augments import FirstAugment, SecondAugment
+
+# Random sites, "units" unit numbers spread over "files" files, like a much bigger dump than the game has
+def build_sites(sites, units, files, seed=0):
+    numpy = analytics.import_numpy()
+    rng = numpy.random.default_rng(seed)
+    return analytics.SiteArrays(rng.integers(0, 1 << 32, sites, dtype=numpy.uint32), rng.integers(0, 1 << 32, sites, dtype=numpy.uint32),
+                                rng.integers(0, units, sites), rng.integers(0, files, sites),
+                                [f"battle/area{index // 10:03d}/scr{index % 10:02d}/section_000.c" for index in range(files)])
+
+def best_time(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times the augment analytics on random sites.")
+    parser.add_argument("--units", type=int, default=256)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # One plan for every site and one that only applies to some units and files, which has to find them first
+    plans = {
+        "impact": EditPlan.from_augments([FirstAugment.ACCURACY_BOOST, FirstAugment.PIERCING_MAGICK], [SecondAugment.STONESKIN], True),
+        "filtered_impact": EditPlan([
+            PlanOperation("add", FirstAugment.SAFETY.value, SecondAugment.STONESKIN.value, parse_units(["12-40"]), None),
+            PlanOperation("remove", FirstAugment.ITEM_BOOST.value, 0, None, ("battle/area01*",))
+        ])
+    }
+
+    for sites in (10_000, 100_000, 1_000_000, 10_000_000):
+        site_arrays = build_sites(sites, args.units, args.files)
+        timings = {
+            "counts": best_time(lambda: analytics.augment_counts(site_arrays), args.repeats),
+            "co_occurrence": best_time(lambda: analytics.co_occurrence(site_arrays), args.repeats)
+        }
+        for name, plan in plans.items():
+            timings[name] = best_time(lambda: analytics.mask_impact(site_arrays, plan), args.repeats)
+
+        print(f"{sites:>10} sites  " + "  ".join(f"{name}={seconds * 1000:8.2f} ms" for name, seconds in timings.items()))
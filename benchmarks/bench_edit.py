@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_corpus
+from augments import FirstAugment, SecondAugment, decode_augments
+from scanner import scan_entries
+from passthrough import PassthroughCopier
+from plan import EditPlan
+from main import find_and_edit_files, collect_files, decode_source, find_edit_spans, rewrite_spans, convert_hex_to_dec
+
+results_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+first_augs = [FirstAugment.ACCURACY_BOOST, FirstAugment.PIERCING_MAGICK]
+second_augs = [SecondAugment.STONESKIN]
+
+def best_time(function, repeats, setup=None):
+    best = None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# Times whole runs of "find_and_edit_files", each one into an empty output folder unless it's the incremental rerun
+def time_end_to_end(input_folder, output_folder, workers, repeats):
+    def clear_output():
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    def run(**options):
+        return lambda: find_and_edit_files(input_folder, output_folder, "section_000.c", first_augs, second_augs, True, **options)
+
+    timings = {
+        "serial": best_time(run(workers=1, pretty_log=False), repeats, clear_output),
+        "serial_unpipelined": best_time(run(workers=1, pretty_log=False, pipeline_depth=0), repeats, clear_output),
+        "parallel": best_time(run(workers=workers, pretty_log=False), repeats, clear_output),
+        "serial_pretty_log": best_time(run(workers=1), repeats, clear_output),
+        "dry_run": best_time(run(workers=1, dry_run=True), repeats)
+    }
+
+    # Everything is skipped the second time
+    clear_output()
+    run(workers=1, incremental=True, pretty_log=False)()
+    timings["incremental_rerun"] = best_time(run(workers=1, incremental=True, pretty_log=False), repeats)
+    clear_output()
+
+    return timings
+
+# Times each stage of editing the target files on its own, in a single process, so a change to one of them shows up
+# Every stage is timed over the whole corpus, with what it needs prepared by the stages before it
+def time_stages(input_folder, output_folder, repeats):
+    plan = EditPlan.from_augments(first_augs, second_augs, True)
+    timings = {}
+
+    shutil.rmtree(output_folder, ignore_errors=True)
+    os.makedirs(output_folder)
+    timings["walk"] = best_time(lambda: collect_files(input_folder, output_folder, "section_000.c"), repeats)
+    files = collect_files(input_folder, output_folder, "section_000.c")
+    target_files = [(source_path, output_path, relative_path) for source_path, output_path, relative_path, is_target in files if is_target]
+    other_files = [(source_path, output_path) for source_path, output_path, _, is_target in files if not is_target]
+
+    def read_all():
+        data = []
+        for source_path, _, _ in target_files:
+            with open(source_path, 'rb') as file:
+                data.append(file.read())
+        return data
+
+    timings["read"] = best_time(read_all, repeats)
+    source_data = read_all()
+
+    timings["decode"] = best_time(lambda: [decode_source(data) for data in source_data], repeats)
+    texts = [decode_source(data) for data in source_data]
+
+    timings["scan"] = best_time(lambda: [list(scan_entries(text)) for text in texts], repeats)
+    site_arguments = [(set_ability.first_arg, set_ability.second_arg) for text in texts for entry in scan_entries(text) for set_ability in entry.abilities]
+
+    # Naming the augments is cached, so it's timed cold
+    def map_all():
+        for first_arg, second_arg in site_arguments:
+            decode_augments(convert_hex_to_dec(first_arg), FirstAugment)
+            decode_augments(convert_hex_to_dec(second_arg), SecondAugment)
+
+    timings["map_augments"] = best_time(map_all, repeats, decode_augments.cache_clear)
+
+    file_plans = [plan.for_path(relative_path) for _, _, relative_path in target_files]
+    timings["edit_augments"] = best_time(lambda: [find_edit_spans(text, source_path, file_plan, {})
+                                                  for text, (source_path, _, _), file_plan in zip(texts, target_files, file_plans)],
+                                         repeats, decode_augments.cache_clear)
+    edits = [find_edit_spans(text, source_path, file_plan, {}) for text, (source_path, _, _), file_plan in zip(texts, target_files, file_plans)]
+
+    timings["rewrite"] = best_time(lambda: [rewrite_spans(text, spans) for text, (spans, _) in zip(texts, edits)], repeats)
+    edited_texts = [rewrite_spans(text, spans) for text, (spans, _) in zip(texts, edits)]
+
+    timings["log"] = best_time(lambda: [json.dumps(log_object, separators=(",", ":")) for _, log_objects in edits for log_object in log_objects.values()], repeats)
+
+    def write_all():
+        for edited_text, (_, output_path, _) in zip(edited_texts, target_files):
+            with open(output_path, 'w', encoding='utf-8') as output_file:
+                output_file.write(edited_text)
+
+    timings["write"] = best_time(write_all, repeats)
+
+    def copy_all():
+        copier = PassthroughCopier()
+        for source_path, output_path in other_files:
+            copier.copy(source_path, output_path)
+
+    timings["passthrough"] = best_time(copy_all, repeats)
+
+    shutil.rmtree(output_folder, ignore_errors=True)
+    return timings
+
+def git_revision():
+    package_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=package_folder, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=package_folder, capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+# Prints each timing of "results" next to the same one of "baseline", slower ones are marked
+def print_comparison(baseline, results):
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')})")
+    for group in ("end_to_end", "stages"):
+        for name, seconds in results[group].items():
+            baseline_seconds = baseline.get(group, {}).get(name)
+            if baseline_seconds is None:
+                continue
+            ratio = seconds / baseline_seconds if baseline_seconds > 0 else float("inf")
+            mark = "  slower" if ratio > 1.05 else ""
+            print(f"{group:10} {name:20} {baseline_seconds * 1000:10.2f} ms -> {seconds * 1000:10.2f} ms  {ratio:6.2f}x{mark}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times find_and_edit_files end to end and each of its stages on a synthetic corpus.")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=40)
+    parser.add_argument("--file-size", type=int, default=64 * 1024)
+    parser.add_argument("--negative-share", type=float, default=0.25)
+    parser.add_argument("--passthrough-files", type=int, default=2)
+    parser.add_argument("--passthrough-size", type=int, default=16 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="JSON file for the results, by default benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    corpus_options = {
+        "files": args.files,
+        "entries": args.entries,
+        "file_size": args.file_size,
+        "negative_share": args.negative_share,
+        "passthrough_files": args.passthrough_files,
+        "passthrough_size": args.passthrough_size,
+        "seed": args.seed
+    }
+
+    work_folder = tempfile.mkdtemp(prefix="augment_bench_")
+    try:
+        input_folder = os.path.join(work_folder, "unpacked")
+        output_folder = os.path.join(work_folder, "edited")
+
+        corpus = generate_corpus(input_folder, **corpus_options)
+        print(f"Corpus: {corpus['files']} target files, {corpus['sites']} sites, "
+              f"{corpus['target_bytes'] / (1024 * 1024):.1f} MiB of targets, {corpus['passthrough_bytes'] / (1024 * 1024):.1f} MiB of other files")
+
+        end_to_end = time_end_to_end(input_folder, output_folder, args.workers, args.repeats)
+        stages = time_stages(input_folder, output_folder, args.repeats)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    commit, dirty = git_revision()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "workers": args.workers,
+        "repeats": args.repeats,
+        "corpus": dict(corpus_options, **corpus),
+        "end_to_end": end_to_end,
+        "stages": stages
+    }
+
+    for group in ("end_to_end", "stages"):
+        for name, seconds in results[group].items():
+            print(f"{group:10} {name:20} {seconds * 1000:10.2f} ms")
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(results_folder, exist_ok=True)
+        output_path = os.path.join(results_folder, f"{commit or 'unknown'}{'-dirty' if dirty else ''}.json")
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=4)
+    print(f"Results written to {output_path}")
+
+    if args.compare is not None:
+        with open(args.compare, 'r', encoding='utf-8') as baseline_file:
+            print_comparison(json.load(baseline_file), results)
@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import entry_pattern
+from scanner import scan_entries
+
+# Builds a decompiled-looking section with "entries" entry functions
+# "filler" lines of unrelated code are put in every entry, and "nested" adds an if block around the calls
+def build_section(entries, filler, nested, seed=0):
+    rng = random.Random(seed)
+    parts = ["script main(0)\n{\n"]
+    for index in range(entries):
+        parts.append(f"    function entry{index:02d}()\n    {{\n")
+        for line in range(filler):
+            parts.append(f"        sysReqew({line}, 0x{rng.getrandbits(16):x});\n")
+        if nested:
+            parts.append("        if (btlGetFlag(1))\n        {\n            wait(1);\n        }\n")
+        parts.append(f"        btlAtelSetUnit({rng.randint(0, 255)});\n")
+        parts.append(f"        btlAtelSetAbility(0x{rng.getrandbits(32):08x}, -0x{rng.getrandbits(31):x});\n")
+        parts.append("        return;\n    }\n")
+    # Entries without any ability are the worst case for the regex, it backtracks through the whole body
+    for index in range(entries // 4):
+        parts.append(f"    function entry{entries + index:02d}()\n    {{\n")
+        parts.append("        btlAtelSetUnit(1);\n" * filler)
+        parts.append("    }\n")
+    parts.append("}\n")
+    return "".join(parts)
+
+# What editing took before "scan_entries": the bodies "entry_pattern" found are searched again for their unit and ability calls,
+# the same patterns "scan_entries" uses, so this finds what it finds for entries without nested blocks
+set_unit_pattern = r'btlAtelSetUnit\(([0-9]+)\)'
+set_ability_pattern = r'btlAtelSetAbility\((-?(?:0x[0-9a-fA-F]+|0)), (-?(?:0x[0-9a-fA-F]+|0))\)'
+
+def regex_sites(regex, text):
+    sites = []
+    for body in regex.findall(text):
+        set_ability_match = re.search(set_ability_pattern, body)
+        for unit_match in re.finditer(set_unit_pattern, body):
+            sites.append((int(unit_match.group(1)), set_ability_match.group(1), set_ability_match.group(2)))
+    return sites
+
+def best_time(function, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run(entries, filler, nested, repeats):
+    text = build_section(entries, filler, nested)
+    regex = re.compile(entry_pattern)
+
+    regex_time, regex_matches = best_time(lambda: regex.findall(text), repeats)
+    sites_time, _ = best_time(lambda: regex_sites(regex, text), repeats)
+    scanner_time, scanner_entries = best_time(lambda: list(scan_entries(text)), repeats)
+
+    size = len(text) / (1024 * 1024)
+    print(f"{size:8.2f} MiB  entries={entries:<6} filler={filler:<4} nested={str(nested):<5} "
+          f"regex={regex_time * 1000:9.2f} ms ({len(regex_matches)} found)  regex+calls={sites_time * 1000:9.2f} ms  "
+          f"scanner={scanner_time * 1000:9.2f} ms ({len(scanner_entries)} found)  "
+          f"speedup={regex_time / scanner_time:6.2f}x ({sites_time / scanner_time:6.2f}x with calls)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the entry_pattern regex with scan_entries on synthetic sections.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # The last two have entries with thousands of "btlAtelSetUnit" calls and no ability, where the regex backtracks quadratically
+    for entries, filler, nested in [(100, 10, False), (1000, 10, False), (5000, 50, False), (1000, 10, True), (1000, 100, False), (4, 4000, False)]:
+        run(entries, filler, nested, args.repeats)
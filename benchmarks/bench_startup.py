@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import importlib.util
+
+package_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Commands that only need the command line should never pull these in
+heavy_modules = ["PyQt5", "sqlite3", "concurrent.futures.process", "numpy"]
+
+# What each startup runs, as the arguments after "python"
+startups = {
+    "interpreter": ["-c", "pass"],
+    "import_main": ["-c", "import main"],
+    "cli_help": ["cli.py", "--help"],
+    "cli_augments": ["cli.py", "augments"]
+}
+
+def best_time(arguments, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, cwd=package_folder, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# Modules that "import_statement" imports, by the cumulative microseconds "-X importtime" gives them, slowest first
+def import_times(import_statement):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", import_statement], cwd=package_folder, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative_time, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        times.append((name, int(self_time), int(cumulative_time)))
+    return sorted(times, key=lambda module_time: module_time[2], reverse=True)
+
+# Best time to import "window" and to build its "MainWindow" in a fresh interpreter, without a display, or None without PyQt5
+# Whether the window works is for tests/test_window.py, here it only has to build
+def window_times(repeats):
+    if importlib.util.find_spec("PyQt5") is None:
+        return None
+    script = ("import time\n"
+              "start = time.perf_counter()\n"
+              "import window\n"
+              "from PyQt5.QtWidgets import QApplication\n"
+              "import_time = time.perf_counter() - start\n"
+              "app = QApplication([])\n"
+              "build_time = None\n"
+              f"for _ in range({repeats}):\n"
+              "    start = time.perf_counter()\n"
+              "    main_window = window.MainWindow()\n"
+              "    elapsed = time.perf_counter() - start\n"
+              "    build_time = elapsed if build_time is None else min(build_time, elapsed)\n"
+              "    main_window.deleteLater()\n"
+              "print(import_time, build_time)\n")
+    environment = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, "-c", script], cwd=package_folder, capture_output=True, text=True, env=environment, check=True)
+    import_time, build_time = [float(part) for part in result.stdout.split()]
+    return {"import": import_time, "build": build_time}
+
+# Heavy modules that are loaded after running the "edit --dry-run" command of the CLI on an empty folder, which should be none
+def loaded_heavy_modules():
+    script = ("import sys, tempfile, cli\n"
+              "folder = tempfile.mkdtemp()\n"
+              "cli.main(['-q', 'edit', '--dry-run', '--workers', '1', '--input', folder, '--add', 'SAFETY'])\n"
+              f"print(','.join(name for name in {heavy_modules!r} if name in sys.modules))\n")
+    result = subprocess.run([sys.executable, "-c", script], cwd=package_folder, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.strip().split(",") if name]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times how long the command line and the engine take to start, and checks they don't load Qt.")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports of \"cli\" and \"main\" to list")
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    timings = {name: best_time(arguments, args.repeats) for name, arguments in startups.items()}
+    for name, seconds in timings.items():
+        overhead = seconds - timings["interpreter"]
+        print(f"{name:16} {seconds * 1000:8.1f} ms  (+{overhead * 1000:.1f} ms over the interpreter)")
+
+    slowest_imports = import_times("import cli, main")[:args.top]
+    print("\nSlowest imports of cli and main (cumulative):")
+    for name, self_time, cumulative_time in slowest_imports:
+        print(f"{name:40} {cumulative_time / 1000:8.1f} ms  (self {self_time / 1000:.1f} ms)")
+
+    window_timings = window_times(args.repeats)
+    if window_timings is None:
+        print("\nWindow: skipped, PyQt5 isn't installed")
+    else:
+        print(f"\nWindow: import {window_timings['import'] * 1000:.1f} ms, MainWindow built in {window_timings['build'] * 1000:.2f} ms")
+
+    heavy = loaded_heavy_modules()
+    print(f"\nHeavy modules loaded by a serial CLI run: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({"timings": timings, "slowest_imports": slowest_imports, "window": window_timings, "heavy_modules": heavy}, output_file, indent=4)
+
+    sys.exit(1 if heavy else 0)
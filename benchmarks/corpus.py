@@ -0,0 +1,123 @@
+import os
+import sys
+import random
+import argparse
+
+# Folders of the generated tree are laid out like the unpacked game, "battle/areaXX/scrXX"
+scripts_per_area = 8
+
+# Builds an "unpacked" tree for the benchmarks with "files" target files of about "file_size" bytes and "entries" entry functions each
+# "negative_share" of the "btlAtelSetAbility" arguments are written as negative hex like the decompiler does, and a few are plain 0
+# Every folder also gets "passthrough_files" other files of "passthrough_size" bytes, which the tool only copies
+# The same arguments always build the same tree, so results of different commits can be compared
+# Returns the number of target files, sites and bytes written
+def generate_corpus(output_folder, files=200, entries=40, file_size=64 * 1024, negative_share=0.25, passthrough_files=2, passthrough_size=16 * 1024,
+                    target_filename="section_000.c", seed=0):
+    rng = random.Random(seed)
+    totals = {"files": 0, "sites": 0, "target_bytes": 0, "passthrough_bytes": 0}
+
+    for index in range(files):
+        folder = os.path.join(output_folder, "battle", f"area{index // scripts_per_area:03d}", f"scr{index % scripts_per_area:02d}")
+        os.makedirs(folder, exist_ok=True)
+
+        section, sites = build_section(rng, entries, file_size, negative_share)
+        data = section.encode('utf-8')
+        with open(os.path.join(folder, target_filename), 'wb') as file:
+            file.write(data)
+
+        totals["files"] += 1
+        totals["sites"] += sites
+        totals["target_bytes"] += len(data)
+
+        for passthrough_index in range(passthrough_files):
+            # Half text sections the tool doesn't edit, half binary data
+            if passthrough_index % 2 == 0:
+                passthrough_name = f"section_{passthrough_index + 1:03d}.c"
+                passthrough_data = build_filler(rng, passthrough_size).encode('utf-8')
+            else:
+                passthrough_name = f"data_{passthrough_index:03d}.bin"
+                passthrough_data = rng.randbytes(passthrough_size)
+
+            with open(os.path.join(folder, passthrough_name), 'wb') as file:
+                file.write(passthrough_data)
+            totals["passthrough_bytes"] += len(passthrough_data)
+
+    return totals
+
+# A decompiled-looking section with about "entries" entry functions, most of them setting units and abilities, padded with
+# functions that don't to about "file_size" bytes
+# Returns the section and how many "btlAtelSetAbility" sites it has
+def build_section(rng, entries, file_size, negative_share):
+    parts = ["// Decompiled section\nscript main(0)\n{\n"]
+    size = len(parts[0])
+    sites = 0
+
+    entry_count = rng.randint(max(0, entries // 2), max(0, entries * 3 // 2))
+    for index in range(entry_count):
+        lines = [f"    function entry{index:02d}()\n", "    {\n"]
+        for _ in range(rng.randint(0, 4)):
+            lines.append(f"        sysReqew({rng.randint(0, 7)}, 0x{rng.getrandbits(16):x});\n")
+
+        # Most entries set one unit, some set a few, and some don't set any ability at all
+        for _ in range(rng.choice((1, 1, 1, 2, 3))):
+            lines.append(f"        btlAtelSetUnit({rng.randint(0, 255)});\n")
+            if rng.random() < 0.1:
+                lines.append("        if (btlGetFlag(1))\n        {\n            wait(1);\n        }\n")
+            if rng.random() < 0.9:
+                lines.append(f"        btlAtelSetAbility({build_argument(rng, negative_share)}, {build_argument(rng, negative_share)});\n")
+                sites += 1
+
+        lines.append("        return;\n    }\n\n")
+        entry = "".join(lines)
+        parts.append(entry)
+        size += len(entry)
+
+    if size < file_size:
+        parts.append(build_filler(rng, file_size - size))
+    parts.append("}\n")
+
+    return "".join(parts), sites
+
+def build_argument(rng, negative_share):
+    if rng.random() < 0.1:
+        return "0"
+    if rng.random() < negative_share:
+        return f"-0x{rng.getrandbits(31) or 1:x}"
+    return f"0x{rng.getrandbits(32):08x}"
+
+# Functions without any "btlAtelSetAbility", "size" bytes long or a bit more
+def build_filler(rng, size):
+    parts = []
+    written = 0
+    index = 0
+    while written < size:
+        function = (f"    function filler{index:04d}()\n    {{\n"
+                    f"        sysReqew({rng.randint(0, 7)}, 0x{rng.getrandbits(16):x});\n"
+                    f"        wait({rng.randint(1, 60)});\n"
+                    f"        // \"btlAtelSetAbility\" in a comment is not a site\n"
+                    f"        return;\n    }}\n\n")
+        parts.append(function)
+        written += len(function)
+        index += 1
+    return "".join(parts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a synthetic unpacked tree for the benchmarks.")
+    parser.add_argument("output", help="Folder to generate the tree in")
+    parser.add_argument("--files", type=int, default=200, help="Number of target files")
+    parser.add_argument("--entries", type=int, default=40, help="Average number of entry functions per target file")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="Minimum size of each target file in bytes")
+    parser.add_argument("--negative-share", type=float, default=0.25, help="Share of the arguments written as negative hex")
+    parser.add_argument("--passthrough-files", type=int, default=2, help="Other files in each folder")
+    parser.add_argument("--passthrough-size", type=int, default=16 * 1024, help="Size of each of the other files in bytes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        print(f"{args.output} is not empty", file=sys.stderr)
+        sys.exit(1)
+
+    totals = generate_corpus(args.output, args.files, args.entries, args.file_size, args.negative_share,
+                             args.passthrough_files, args.passthrough_size, seed=args.seed)
+    print(f"Generated {totals['files']} target files with {totals['sites']} sites, "
+          f"{totals['target_bytes'] / (1024 * 1024):.1f} MiB of targets and {totals['passthrough_bytes'] / (1024 * 1024):.1f} MiB of other files")
@@ -1,3 +1,4 @@
 @echo off
 pyinstaller --onefile --noconsole ff12-augment-tool.py
+pyinstaller --onefile --console --name ff12-augment-tool-cli cli.py
 pause
\ No newline at end of file
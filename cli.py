@@ -0,0 +1,228 @@
+import os
+import sys
+import argparse
+
+# Exit codes, usage errors are also what argparse exits with
+exit_ok = 0
+exit_failed = 1
+exit_usage = 2
+exit_interrupted = 130
+
+# Command line for running the tool without the window, never imports Qt
+# The modules each command needs are only imported by that command, so "--help" and the quick commands start fast
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ff12-augment-tool-cli", description="Edits the augments of the unpacked FFXII battle scripts without the window.")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log every file and site, twice to also log every augment bit")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    edit_parser = subparsers.add_parser("edit", help="Add or remove augments in every target file and mirror the input folder into the output folder")
+    add_edit_arguments(edit_parser)
+    edit_parser.add_argument("--no-incremental", dest="incremental", action="store_false", help="Edit every file again instead of skipping the unchanged ones")
+    edit_parser.add_argument("--passthrough", default="auto", help="How the other files are copied: auto, reflink, hardlink, copy_file_range, sendfile or copy (auto never makes hardlinks)")
+    edit_parser.add_argument("--output-mode", choices=["mirror", "overlay", "zip", "tar"], default="mirror",
+                             help="mirror copies the whole input folder, overlay only writes the modified target files, zip and tar stream them into an archive")
+    edit_parser.add_argument("--pipeline-depth", type=int, default=4,
+                             help="With one worker, how many files reading and writing can get ahead of editing, 0 edits one file at a time")
+    edit_parser.add_argument("--no-pretty-log", dest="pretty_log", action="store_false", help="Only write log.jsonl, not the indented log.json")
+    edit_parser.add_argument("--profile", help="Profile the run into this file, .prof for cProfile or .html for pyinstrument")
+    edit_parser.add_argument("--dry-run", action="store_true", help="Only print the diff of what would change, like the preview command")
+    edit_parser.set_defaults(handler=run_edit)
+
+    preview_parser = subparsers.add_parser("preview", help="Print what an edit would change without writing anything")
+    add_edit_arguments(preview_parser)
+    preview_parser.add_argument("--summary", action="store_true", help="Print the augments added and removed at each site instead of the diff")
+    preview_parser.set_defaults(handler=run_preview, dry_run=True)
+
+    # The arguments after "index" are parsed by "site_index", which is only imported when it's the command being run
+    index_parser = subparsers.add_parser("index", add_help=False, help="Keep and query the SQLite index of every btlAtelSetAbility site (see \"index --help\")")
+    index_parser.set_defaults(handler=run_index)
+
+    watch_parser = subparsers.add_parser("watch", help="Edit the input folder like \"edit\", then edit and copy again only the files that change until stopped")
+    add_edit_arguments(watch_parser)
+    watch_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between two looks at the input folder")
+    watch_parser.add_argument("--debounce", type=float, default=0.5, help="Seconds without any change before a batch of changes is processed")
+    watch_parser.add_argument("--passthrough", default="auto", help="How the other files are copied: auto, reflink, hardlink, copy_file_range, sendfile or copy (auto never makes hardlinks)")
+    watch_parser.add_argument("--pretty-log", action="store_true", help="Also write the indented log.json after every batch, which rewrites it whole")
+    watch_parser.set_defaults(handler=run_watch)
+
+    revert_parser = subparsers.add_parser("revert", help="Undo the last edits of the output folder with its undo journal, only touching the files they modified")
+    revert_parser.add_argument("--output", default="edited", help="Folder the edited files were written to")
+    revert_parser.set_defaults(handler=run_revert)
+
+    analytics_parser = subparsers.add_parser("analytics", help="Count the augments of every site, which ones go together and what a plan would change (needs NumPy)")
+    analytics_parser.add_argument("--input", default="unpacked", help="Folder with the unpacked files")
+    analytics_parser.add_argument("--target", default="section_000.c", help="Name of the files to scan")
+    analytics_parser.add_argument("--index-path", help="Read the sites from the SQLite site index at this path, updating it first, instead of scanning the files")
+    impact_group = analytics_parser.add_mutually_exclusive_group()
+    impact_group.add_argument("--add", nargs="+", metavar="AUGMENT", help="Also count what adding these augments would change")
+    impact_group.add_argument("--remove", nargs="+", metavar="AUGMENT", help="Also count what removing these augments would change")
+    impact_group.add_argument("--plan", help="Also count what this JSON or TOML plan would change")
+    analytics_parser.add_argument("--top", type=int, default=10, help="Pairs of augments to list")
+    analytics_parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    analytics_parser.set_defaults(handler=run_analytics)
+
+    augments_parser = subparsers.add_parser("augments", help="List the names of the augments")
+    augments_parser.set_defaults(handler=run_augments)
+
+    return parser
+
+# Options shared by "edit" and "preview"
+def add_edit_arguments(parser):
+    parser.add_argument("--input", default="unpacked", help="Folder with the unpacked files")
+    parser.add_argument("--output", default="edited", help="Folder the edited files are written to")
+    parser.add_argument("--target", default="section_000.c", help="Name of the files to edit")
+    operation_group = parser.add_mutually_exclusive_group(required=True)
+    operation_group.add_argument("--add", nargs="+", metavar="AUGMENT", help="Augments to add, by name")
+    operation_group.add_argument("--remove", nargs="+", metavar="AUGMENT", help="Augments to remove, by name")
+    operation_group.add_argument("--plan", help="JSON or TOML plan file with the operations to apply")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, 1 edits the files one at a time")
+    parser.add_argument("--index-path", help="Use the SQLite site index at this path to skip the files that don't change")
+
+# The plan of the "--add", "--remove" or "--plan" option, checking the input folder first since walking a missing folder finds no files
+def build_plan(args):
+    from plan import EditPlan, load_plan
+
+    if not os.path.isdir(args.input):
+        raise FileNotFoundError(f"Input folder not found: {args.input}")
+
+    if args.plan is not None:
+        return load_plan(args.plan)
+
+    return EditPlan.from_selection(args.add or args.remove, args.add is not None)
+
+def run_edit(args):
+    from main import apply_edit_plan
+
+    plan = build_plan(args)
+    summary = apply_edit_plan(args.input, args.output, args.target, plan, args.workers, args.incremental, args.passthrough,
+                              pretty_log=args.pretty_log, index_path=args.index_path, dry_run=args.dry_run, profile_path=args.profile,
+                              output_mode=args.output_mode, pipeline_depth=args.pipeline_depth)
+    if args.dry_run:
+        sys.stdout.write(summary["diff"])
+    return exit_ok
+
+def run_preview(args):
+    from main import apply_edit_plan
+
+    plan = build_plan(args)
+    summary = apply_edit_plan(args.input, args.output, args.target, plan, args.workers, index_path=args.index_path, dry_run=True)
+
+    if args.summary:
+        for change in summary["changes"]:
+            print(change["path"])
+            for site in change["sites"]:
+                added = "".join(f" +{augment}" for augment in site["added"])
+                removed = "".join(f" -{augment}" for augment in site["removed"])
+                print(f"    unit {site['unit']}: {site['before']} -> {site['after']}{added}{removed}")
+    else:
+        sys.stdout.write(summary["diff"])
+    return exit_ok
+
+def run_index(args):
+    import site_index
+
+    return site_index.main(args.index_args, prog=f"{build_parser().prog} index")
+
+# Runs until interrupted, which exits with "exit_interrupted" like any other command
+def run_watch(args):
+    from watch import watch_folder
+
+    plan = build_plan(args)
+    watch_folder(args.input, args.output, args.target, plan, args.workers, args.interval, args.debounce, args.passthrough,
+                 pretty_log=args.pretty_log, index_path=args.index_path)
+    return exit_ok
+
+def run_revert(args):
+    from journal import revert_journal, journal_filename
+
+    if not os.path.isfile(os.path.join(args.output, journal_filename)):
+        raise FileNotFoundError(f"No undo journal in {args.output}")
+
+    summary = revert_journal(args.output)
+    print(f"Reverted {summary['sites']} sites in {summary['reverted']} of {summary['files']} files")
+    for path in summary["failed"]:
+        print(f"error: {path} doesn't match the journal anymore, left as it is", file=sys.stderr)
+    return exit_failed if summary["failed"] else exit_ok
+
+def run_analytics(args):
+    import analytics
+
+    if not os.path.isdir(args.input):
+        raise FileNotFoundError(f"Input folder not found: {args.input}")
+    plan = build_plan(args) if (args.add or args.remove or args.plan) else None
+
+    if args.index_path is not None:
+        import site_index
+        connection = site_index.open_index(args.index_path)
+        try:
+            site_index.update_index(connection, args.input, args.target)
+            sites = analytics.load_sites_from_index(connection)
+        finally:
+            connection.close()
+    else:
+        sites = analytics.load_sites(args.input, args.target)
+
+    report = analytics.analyze(sites, plan, args.top)
+    if args.json:
+        import json
+        print(json.dumps(report, indent=4))
+        return exit_ok
+
+    print(f"{report['sites']} sites of {report['units']} units in {report['files']} files")
+    print("\nSites with each augment:")
+    for aug_name, count in sorted(report["augments"].items(), key=lambda item: item[1], reverse=True):
+        print(f"    {aug_name:<24} {count:>8}  {count / report['sites'] * 100:5.1f}%")
+    print("\nAugments found together the most:")
+    for first_name, second_name, count in report["pairs"]:
+        print(f"    {first_name} + {second_name}: {count}")
+
+    impact = report.get("impact")
+    if impact is not None:
+        print(f"\nThe edit would change {impact['sites_changed']} sites of {impact['units_changed']} units in {impact['files_changed']} files")
+        for aug_name, count in impact["gained"].items():
+            print(f"    +{aug_name}: {count} sites")
+        for aug_name, count in impact["lost"].items():
+            print(f"    -{aug_name}: {count} sites")
+    return exit_ok
+
+def run_augments(args):
+    from augments import augment_registry
+
+    for info in augment_registry.values():
+        print(f"{info.name:<24} {info.argument:<6} 0x{info.value:08x}  {info.tooltip}")
+    return exit_ok
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra_args = parser.parse_known_args(argv)
+    if args.command == "index":
+        args.index_args = extra_args
+    elif extra_args:
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+
+    # Logging is only set up for the commands that log, the same way "main" does it
+    if args.command in ("edit", "preview", "watch"):
+        from main import configure_logging
+        configure_logging(0 if args.quiet else 1 + args.verbose)
+
+    try:
+        return args.handler(args)
+    except ValueError as error:
+        # Unknown augments, invalid plans and options the engine doesn't accept
+        print(f"error: {error}", file=sys.stderr)
+        return exit_usage
+    except OSError as error:
+        print(f"error: {error}", file=sys.stderr)
+        return exit_failed
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return exit_interrupted
+
+if __name__ == "__main__":
+    # Needed so the edit worker processes can start from a frozen executable, it does nothing otherwise
+    # and importing "multiprocessing" costs more than the rest of the startup
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
@@ -3,6 +3,10 @@ from window import MainWindow
 from PyQt5.QtWidgets import QApplication
 
 if __name__ == "__main__":
+    # Needed so the edit worker processes can start from the frozen executable, importing "multiprocessing" is only worth it there
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
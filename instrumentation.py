@@ -0,0 +1,98 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+# Stages in the order they happen, the table lists them like this and any other after them
+stage_order = ["manifest", "index", "walk", "skip_check", "read", "decode", "scan", "edit_augments", "map_augments", "rewrite", "write",
+               "passthrough", "log", "journal", "pretty_log", "save_manifest"]
+
+# Stages whose time is already part of another one
+nested_stages = {"map_augments": "edit_augments"}
+
+# Time spent in each stage and counters like bytes read or sites edited for one run
+# The worker processes keep their own and send them back with every file, so stages run in workers add up the time of all of them
+class RunStats:
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def add(self, name, count=1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    # Adds the stats of a worker, as given by "to_dict"
+    def merge(self, stats):
+        for name, seconds in stats["timers"].items():
+            self.add_time(name, seconds)
+        for name, count in stats["counters"].items():
+            self.add(name, count)
+
+    def to_dict(self):
+        return {"timers": dict(self.timers), "counters": dict(self.counters)}
+
+run_stats_filename = "run_stats.json"
+
+# Writes the stats of a run, as given by "RunStats.to_dict", and its elapsed time next to its log
+# They change with every run, so they're kept out of the log, which only depends on the files and the plan
+def write_run_stats(output_folder, stats, elapsed):
+    with open(os.path.join(output_folder, run_stats_filename), 'w', encoding='utf-8') as stats_file:
+        json.dump(dict(stats, elapsed=elapsed), stats_file, indent=4)
+
+# One line per stage with its time and share of "elapsed", then the counters
+def format_stats_table(stats, elapsed=None):
+    timers = stats["timers"]
+    names = [name for name in stage_order if name in timers] + sorted(name for name in timers if name not in stage_order)
+
+    lines = [f"{'stage':<16}{'time':>12}{'share':>9}"]
+    for name in names:
+        share = f"{timers[name] / elapsed * 100:8.1f}%" if elapsed else ""
+        label = f"  {name}" if name in nested_stages else name
+        lines.append(f"{label:<16}{timers[name] * 1000:>9.1f} ms{share}")
+    if elapsed is not None:
+        lines.append(f"{'total':<16}{elapsed * 1000:>9.1f} ms")
+
+    if stats["counters"]:
+        lines.append("")
+        for name, count in sorted(stats["counters"].items()):
+            lines.append(f"{name:<16}{count:>12}")
+
+    return "\n".join(lines)
+
+# Runs "function" under a profiler and dumps the profile to "profile_path"
+# ".html" paths use pyinstrument if it's installed, anything else gets a cProfile dump for "pstats" or snakeviz
+# Only the main process is profiled, with "workers" above 1 the editing itself happens in the worker processes
+def run_profiled(profile_path, function, *args, **kwargs):
+    if profile_path.lower().endswith(".html"):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ValueError("HTML profiles need pyinstrument, install it or use a .prof path for cProfile")
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.stop()
+            with open(profile_path, 'w', encoding='utf-8') as profile_file:
+                profile_file.write(profiler.output_html())
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
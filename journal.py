@@ -0,0 +1,260 @@
+import os
+import zlib
+import struct
+import hashlib
+from collections import namedtuple
+
+journal_filename = "undo_journal.bin"
+journal_magic = b"FF12UNDO"
+journal_version = 1
+
+# Each file the edit modified gets a record: its path relative to the output folder, the SHA-1 of its source and either its sites
+# or, for files whose newlines the edit changed everywhere, the SHA-1 of the edited file and the whole source compressed
+journal_sites = 0
+journal_whole_file = 1
+# Appended by the batches of "watch_folder" for files whose output isn't modified anymore or whose source is gone,
+# a record of a file replaces the ones before it, so this drops them
+journal_removed = 2
+
+header_struct = struct.Struct("<8sH")
+# Path length, then after the path: source SHA-1, kind and the number of sites or the length of the compressed source
+file_struct = struct.Struct("<H")
+file_info_struct = struct.Struct("<20sBI")
+# Offset of the site in the edited file, original and edited bitfields of both arguments and length of the original call,
+# which is written after it since the edit can change its length (like "0" becoming "0x00000001")
+site_struct = struct.Struct("<QIIIIH")
+
+JournalFile = namedtuple("JournalFile", ["path", "source_hash", "kind", "count", "payload", "record"])
+JournalSite = namedtuple("JournalSite", ["offset", "original_first_augs", "original_second_augs", "edited_first_augs", "edited_second_augs", "original"])
+
+# The journal entry of a file edited as bytes, with the spans "find_edit_spans" found in "source_buffer"
+# Offsets are moved by the length changes of the sites before them, so they point into the edited file
+def encode_sites(source_buffer, spans):
+    from main import convert_hex_to_dec
+
+    records = []
+    shift = 0
+    for start, end, replacement in sorted(spans):
+        original = bytes(source_buffer[start:end])
+        edited = replacement.encode('utf-8')
+        original_first_arg, original_second_arg = call_arguments(original)
+        edited_first_arg, edited_second_arg = call_arguments(edited)
+        records.append(site_struct.pack(start + shift, convert_hex_to_dec(original_first_arg), convert_hex_to_dec(original_second_arg),
+                                        convert_hex_to_dec(edited_first_arg), convert_hex_to_dec(edited_second_arg), len(original)))
+        records.append(original)
+        shift += len(edited) - (end - start)
+    return journal_sites, len(spans), b"".join(records)
+
+# The journal entry of a file that's written decoded, where every newline may have changed
+def encode_whole_file(source_data, output_data):
+    payload = hashlib.sha1(output_data).digest() + zlib.compress(bytes(source_data))
+    return journal_whole_file, len(payload), payload
+
+# The two arguments of a "btlAtelSetAbility(first, second)" call, as text
+def call_arguments(call):
+    first_arg, second_arg = call[call.index(b"(") + 1:-1].split(b", ")
+    return first_arg.decode('ascii'), second_arg.decode('ascii')
+
+# The call the edit writes for the edited bitfields of a site
+def edited_call(site):
+    from main import convert_dec_to_compatible_hex
+
+    return (f"btlAtelSetAbility({convert_dec_to_compatible_hex(site.edited_first_augs)}, "
+            f"{convert_dec_to_compatible_hex(site.edited_second_augs)})").encode('utf-8')
+
+def decode_sites(journal_file):
+    sites = []
+    position = 0
+    for _ in range(journal_file.count):
+        offset, original_first_augs, original_second_augs, edited_first_augs, edited_second_augs, length = site_struct.unpack_from(journal_file.payload, position)
+        position += site_struct.size
+        sites.append(JournalSite(offset, original_first_augs, original_second_augs, edited_first_augs, edited_second_augs,
+                                 journal_file.payload[position:position + length]))
+        position += length
+    return sites
+
+# Writes the journal of a run as the files are done, into a temporary file that replaces the last journal once it's closed
+# Records of the last journal are kept for the files the run skips (see "keep_previous") and for the ones it never gets to,
+# since their outputs are still the ones the last run wrote
+class JournalWriter:
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, journal_filename)
+        self.previous_files = {journal_file.path: journal_file for journal_file in load_journal(output_folder)}
+        self.done_paths = set()
+        self.file = open(self.path + ".tmp", 'wb')
+        self.file.write(header_struct.pack(journal_magic, journal_version))
+
+    # "journal_entry" is what "encode_sites" or "encode_whole_file" gave for the file, None when the file wasn't modified
+    def write(self, relative_path, source_hash=None, journal_entry=None):
+        self.done_paths.add(relative_path.replace(os.sep, "/"))
+        if journal_entry is not None:
+            self.file.write(encode_record(relative_path, source_hash, journal_entry))
+
+    # Copies the record of the last journal for a file whose output the run didn't touch
+    def keep_previous(self, relative_path):
+        journal_path = relative_path.replace(os.sep, "/")
+        self.done_paths.add(journal_path)
+        previous_file = self.previous_files.get(journal_path)
+        if previous_file is not None:
+            self.file.write(previous_file.record)
+
+    def close(self):
+        for journal_path, previous_file in self.previous_files.items():
+            if journal_path not in self.done_paths:
+                self.file.write(previous_file.record)
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+def encode_record(relative_path, source_hash, journal_entry):
+    kind, count, payload = journal_entry
+    encoded_path = relative_path.replace(os.sep, "/").encode('utf-8')
+    return file_struct.pack(len(encoded_path)) + encoded_path + file_info_struct.pack(bytes.fromhex(source_hash), kind, count) + payload
+
+# Adds the records of the files a batch of "watch_folder" edited to the end of the journal, instead of writing it again
+# "records" are (relative_path, source_hash, journal_entry), with None entries for the files that have nothing to revert anymore
+def append_journal(output_folder, records):
+    path = os.path.join(output_folder, journal_filename)
+    try:
+        with open(path, 'rb') as journal:
+            has_header = journal.read(header_struct.size) == header_struct.pack(journal_magic, journal_version)
+    except FileNotFoundError:
+        has_header = False
+
+    with open(path, 'ab' if has_header else 'wb') as journal:
+        if not has_header:
+            journal.write(header_struct.pack(journal_magic, journal_version))
+        for relative_path, source_hash, journal_entry in records:
+            if journal_entry is None:
+                journal_entry = (journal_removed, 0, b"")
+                source_hash = "00" * 20
+            journal.write(encode_record(relative_path, source_hash, journal_entry))
+
+# The records of the journal in "output_folder", empty when there's none or it can't be read
+# Only the last record of each file counts, and files whose last record is "journal_removed" have none
+def load_journal(output_folder):
+    try:
+        with open(os.path.join(output_folder, journal_filename), 'rb') as journal:
+            data = journal.read()
+    except FileNotFoundError:
+        return []
+
+    if len(data) < header_struct.size or header_struct.unpack_from(data) != (journal_magic, journal_version):
+        return []
+
+    journal_files = {}
+    position = header_struct.size
+    try:
+        while position < len(data):
+            start = position
+            path_length, = file_struct.unpack_from(data, position)
+            position += file_struct.size
+            path = data[position:position + path_length].decode('utf-8')
+            position += path_length
+            source_digest, kind, count = file_info_struct.unpack_from(data, position)
+            position += file_info_struct.size
+
+            if kind == journal_whole_file:
+                payload_length = count
+            elif kind == journal_removed:
+                payload_length = 0
+            else:
+                # The sites have to be walked to know where the record ends
+                payload_length = 0
+                for _ in range(count):
+                    payload_length += site_struct.size + site_struct.unpack_from(data, position + payload_length)[5]
+            if position + payload_length > len(data):
+                break
+            payload = data[position:position + payload_length]
+            position += payload_length
+            journal_files.pop(path, None)
+            if kind != journal_removed:
+                journal_files[path] = JournalFile(path, source_digest.hex(), kind, count, payload, data[start:position])
+    except (struct.error, UnicodeDecodeError):
+        # A journal cut short keeps the records before the cut
+        pass
+
+    return list(journal_files.values())
+
+# Puts back the original calls of every site in the journal of "output_folder", only touching the files the edit modified,
+# so undoing an edit costs as much as the files it changed instead of the whole tree
+# Every site must still hold what the edit wrote, and the file must hash like its source once reverted, or it's left alone
+# Files whose sites all keep their length are patched in place, others are written whole, and the journal is removed in the end,
+# keeping the records of the files that couldn't be reverted
+# Returns how many files and sites were reverted and the paths of the files that failed
+def revert_journal(output_folder):
+    summary = {"files": 0, "reverted": 0, "sites": 0, "failed": []}
+    failed_files = []
+
+    for journal_file in load_journal(output_folder):
+        summary["files"] += 1
+        output_path = os.path.join(output_folder, journal_file.path.replace("/", os.sep))
+        try:
+            reverted_sites = revert_file(output_path, journal_file)
+        except OSError:
+            reverted_sites = None
+
+        if reverted_sites is None:
+            summary["failed"].append(journal_file.path)
+            failed_files.append(journal_file)
+        else:
+            summary["reverted"] += 1
+            summary["sites"] += reverted_sites
+
+    journal_path = os.path.join(output_folder, journal_filename)
+    if failed_files:
+        with open(journal_path + ".tmp", 'wb') as journal:
+            journal.write(header_struct.pack(journal_magic, journal_version))
+            for journal_file in failed_files:
+                journal.write(journal_file.record)
+        os.replace(journal_path + ".tmp", journal_path)
+    elif os.path.isfile(journal_path):
+        os.remove(journal_path)
+
+    return summary
+
+# Reverts one file, returning how many sites it had or None when its output isn't what the journal expects
+def revert_file(output_path, journal_file):
+    with open(output_path, 'rb') as output_file:
+        output_data = output_file.read()
+
+    if journal_file.kind == journal_whole_file:
+        if hashlib.sha1(output_data).digest() != journal_file.payload[:20]:
+            return None
+        source_data = zlib.decompress(journal_file.payload[20:])
+        if hashlib.sha1(source_data).hexdigest() != journal_file.source_hash:
+            return None
+        replace_file(output_path, source_data)
+        return 0
+
+    sites = decode_sites(journal_file)
+    pieces = []
+    position = 0
+    in_place = True
+    for site in sites:
+        edited = edited_call(site)
+        if output_data[site.offset:site.offset + len(edited)] != edited:
+            return None
+        pieces.append(output_data[position:site.offset])
+        pieces.append(site.original)
+        position = site.offset + len(edited)
+        in_place = in_place and len(edited) == len(site.original)
+    pieces.append(output_data[position:])
+
+    source_data = b"".join(pieces)
+    if hashlib.sha1(source_data).hexdigest() != journal_file.source_hash:
+        return None
+
+    if in_place:
+        with open(output_path, 'r+b') as output_file:
+            for site in sites:
+                output_file.seek(site.offset)
+                output_file.write(site.original)
+    else:
+        replace_file(output_path, source_data)
+    return len(sites)
+
+# Writes the whole file next to it first, so a failed write never leaves it half done
+def replace_file(output_path, data):
+    with open(output_path + ".tmp", 'wb') as temporary_file:
+        temporary_file.write(data)
+    os.replace(output_path + ".tmp", output_path)
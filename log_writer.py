@@ -0,0 +1,86 @@
+import os
+import json
+
+log_jsonl_filename = "log.jsonl"
+log_json_filename = "log.json"
+previous_log_jsonl_filename = "log.previous.jsonl"
+
+# Writes the log objects of each file as soon as the file is done, one JSON object per line,
+# so the log never has to be held in memory
+# With "append" the objects go after the ones already in the log, like the batches of "watch_folder" do,
+# and the manifest points at the newest objects of each file
+class LogWriter:
+    def __init__(self, output_folder, append=False):
+        self.path = os.path.join(output_folder, log_jsonl_filename)
+        self.file = open(self.path, 'ab' if append else 'wb')
+        self.position = self.file.tell()
+
+    # Returns the (offset, length) of what was written, so it can be copied from this log later
+    def write(self, log_objects):
+        data = b"".join(json.dumps(log_object, separators=(",", ":")).encode('utf-8') + b"\n" for log_object in log_objects)
+        return self.write_raw(data)
+
+    def write_raw(self, data):
+        offset = self.position
+        self.file.write(data)
+        self.position += len(data)
+        return offset, len(data)
+
+    def close(self):
+        self.file.close()
+
+# Reads back what a "LogWriter" wrote in a previous run, by the (offset, length) it returned
+class PreviousLog:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+
+    def read(self, offset, length):
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    # The previous log is not needed anymore once the new manifest is saved
+    def close(self):
+        self.file.close()
+        os.remove(self.path)
+
+# Turns "log.jsonl" into the indented "log.json" one object at a time
+# The result is the same as "json.dump(log_objects, log_file, indent=4)" of all the objects
+# With "log_spans", the (offset, length) the manifest keeps, only the objects they point at are taken, in their order
+def write_pretty_log(log_jsonl_path, log_json_path, log_spans=None):
+    with open(log_jsonl_path, 'rb') as log_jsonl_file, open(log_json_path, 'w', encoding='utf-8') as log_json_file:
+        is_first = True
+        for line in log_lines(log_jsonl_file, log_spans):
+            log_object = json.loads(line)
+            pretty_object = json.dumps(log_object, indent=4).replace("\n", "\n    ")
+            log_json_file.write("[\n    " if is_first else ",\n    ")
+            log_json_file.write(pretty_object)
+            is_first = False
+
+        log_json_file.write("[]" if is_first else "\n]")
+
+def log_lines(log_jsonl_file, log_spans):
+    if log_spans is None:
+        yield from log_jsonl_file
+        return
+    for offset, length in log_spans:
+        log_jsonl_file.seek(offset)
+        yield from log_jsonl_file.read(length).splitlines()
+
+# Finds the log the manifest was saved with, by its size, and moves it out of the way of the new log
+# A leftover "log.previous.jsonl" from a run that didn't finish is used if it's the one that matches
+def open_previous_log(output_folder, log_size):
+    if log_size is None:
+        return None
+
+    log_jsonl_path = os.path.join(output_folder, log_jsonl_filename)
+    previous_log_path = os.path.join(output_folder, previous_log_jsonl_filename)
+
+    if os.path.isfile(log_jsonl_path) and os.path.getsize(log_jsonl_path) == log_size:
+        os.replace(log_jsonl_path, previous_log_path)
+        return PreviousLog(previous_log_path)
+
+    if os.path.isfile(previous_log_path) and os.path.getsize(previous_log_path) == log_size:
+        return PreviousLog(previous_log_path)
+
+    return None
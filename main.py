@@ -1,54 +1,915 @@
+import io
 import os
 import re
-import json
-import shutil
-from augments import FirstAugment, SecondAugment
+import time
+import mmap
+import logging
+from itertools import takewhile
+from collections import deque
+from augments import FirstAugment, SecondAugment, decode_augments
+from plan import EditPlan, load_plan, apply_masks
+from scanner import scan_entries
+from passthrough import PassthroughCopier, unlink_output
+from log_writer import LogWriter, open_previous_log, write_pretty_log, log_json_filename
+from instrumentation import RunStats, format_stats_table, run_profiled, write_run_stats
+from manifest import load_manifest, save_manifest, append_manifest_updates, manifest_entry, find_unchanged_entry, hash_bytes
+from journal import JournalWriter, append_journal, encode_sites, encode_whole_file
 
-set_unit_pattern = r'btlAtelSetUnit\(([0-9]+)\)'
-set_ability_pattern = r'btlAtelSetAbility\((-?(?:0x[0-9a-fA-F]+|0)), (-?(?:0x[0-9a-fA-F]+|0))\)'
+logger = logging.getLogger(__name__)
+
+# Logged below DEBUG, for each augment bit of every site
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+# A newline that writing in text mode on Windows would change, a "\n" without its "\r" or a "\r" on its own
+lone_newline_regex = re.compile(rb'\r(?!\n)|(?<!\r)\n')
+
+# Files of a chunk sent to a worker process at most
+max_chunk_files = 16
+
+# Kept for comparison in the benchmarks, files are scanned with "scan_entries" instead
 entry_pattern = r'entry[0-9]+\(\)\s*{([^}]*btlAtelSetUnit[^}]*btlAtelSetAbility[^}]*)}'
 
-def find_and_edit_files(input_folder, output_folder, target_filename, first_augs, second_augs, should_add):
-    log_objects = []
-    
-    for folder_path, _, filenames in os.walk(input_folder):
+# With "incremental" a manifest is kept in the output folder, and files whose source and selected augments
+# didn't change since the last run are skipped completely
+# "passthrough" picks how the other files are copied (see "passthrough_strategies"), "auto" uses the fastest one that works
+# "progress_callback(done, total, source_path)" is called after every file, and the run stops before the next file
+# once "should_cancel()" returns True, keeping the log and manifest of the files already done
+# The log of each file is written to "log.jsonl" as soon as the file is done, "pretty_log" also writes the indented "log.json" in the end
+# With "index_path" the SQLite index of "site_index" is updated first, and target files none of whose sites change
+# are copied and logged from the index instead of being edited ("unchanged" in the summary)
+# Returns a summary with how many files were found, edited, copied and skipped, the passthrough strategies used and the elapsed time
+# "stats" in the summary has the time spent in each stage and counters like bytes read and sites edited (see "RunStats"),
+# they're also logged as a table and written to "run_stats.json", apart from the log so the log stays the same from run to run
+# With "profile_path" the whole run is profiled (see "run_profiled") and with "dry_run" nothing is written at all, see "preview_edit_plan"
+# The sites of every modified file are recorded in "undo_journal.bin", so "revert_journal" can undo the edit in place
+# "output_mode" other than "mirror" only writes the modified target files, see "write_overlay"
+# With a single worker the target files are read, edited and written in separate threads, at most "pipeline_depth" files apart
+# (see "pipelined_edit_target_files"), 0 does everything one file after the other in this thread
+def find_and_edit_files(input_folder, output_folder, target_filename, first_augs, second_augs, should_add, workers=1, incremental=False, passthrough="auto",
+                        progress_callback=None, should_cancel=None, pretty_log=True, index_path=None, dry_run=False, profile_path=None, output_mode="mirror",
+                        pipeline_depth=4):
+    plan = EditPlan.from_augments(first_augs, second_augs, should_add)
+    return apply_edit_plan(input_folder, output_folder, target_filename, plan, workers, incremental, passthrough,
+                           progress_callback, should_cancel, pretty_log, index_path, dry_run, profile_path, output_mode, pipeline_depth)
+
+# Same as "find_and_edit_files" with every operation of "plan" (an "EditPlan", see "load_plan") applied in a single pass
+def apply_edit_plan(input_folder, output_folder, target_filename, plan, workers=1, incremental=False, passthrough="auto",
+                    progress_callback=None, should_cancel=None, pretty_log=True, index_path=None, dry_run=False, profile_path=None, output_mode="mirror",
+                    pipeline_depth=4):
+    if profile_path is not None:
+        summary = run_profiled(profile_path, apply_edit_plan, input_folder, output_folder, target_filename, plan, workers, incremental, passthrough,
+                               progress_callback, should_cancel, pretty_log, index_path, dry_run, None, output_mode, pipeline_depth)
+        logger.info(f"Profile written to {profile_path}")
+        return summary
+
+    if dry_run:
+        return preview_edit_plan(input_folder, target_filename, plan, workers, progress_callback, should_cancel, index_path)
+
+    if output_mode != "mirror":
+        return write_overlay(input_folder, output_folder, target_filename, plan, output_mode, workers, progress_callback, should_cancel, pretty_log, index_path,
+                             pipeline_depth)
+
+    start_time = time.perf_counter()
+    summary = {"files": 0, "edited": 0, "unchanged": 0, "copied": 0, "skipped": 0, "cancelled": False}
+    stats = RunStats()
+    copier = PassthroughCopier(passthrough)
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    fingerprint = plan.fingerprint()
+    with stats.stage("manifest"):
+        manifest, log_size = load_manifest(output_folder, input_folder, target_filename) if incremental else ({}, None)
+        new_manifest = {}
+
+        # Skipped files copy their log from the last run's log
+        previous_log = open_previous_log(output_folder, log_size) if incremental else None
+
+    # Everything that can fail goes in the "try", so the writers are always closed
+    log_writer = None
+    journal_writer = None
+    index_connection = None
+    edited_files = None
+    try:
+        changed_paths = None
+        if index_path is not None:
+            with stats.stage("index"):
+                # Only needed with an index, so runs without one don't pay for importing sqlite3
+                import site_index
+                index_connection = site_index.open_index(index_path)
+                site_index.update_index(index_connection, input_folder, target_filename)
+                changed_paths = site_index.find_changed_files(index_connection, plan)
+
+        with stats.stage("walk"):
+            files = collect_files(input_folder, output_folder, target_filename)
+        total_files = len(files)
+        summary["files"] = total_files
+
+        # Decide what can be skipped first, the worker processes need the whole list of files to edit
+        file_states = []
+        with stats.stage("skip_check"):
+            for source_path, output_path, relative_path, is_target in files:
+                source_stat = os.stat(source_path) if incremental else None
+                entry = None
+                if incremental:
+                    entry = find_unchanged_entry(manifest, relative_path, source_path, source_stat, output_path, fingerprint if is_target else None)
+                    if entry is not None and is_target and previous_log is None:
+                        entry = None
+
+                indexed_file = None
+                if index_connection is not None and is_target and entry is None and relative_path not in changed_paths:
+                    indexed_file = site_index.find_file(index_connection, relative_path)
+                    if indexed_file is not None and not site_index.keeps_newlines(indexed_file[0]):
+                        indexed_file = None
+
+                file_states.append((source_stat, entry, indexed_file))
+
+        # Each file gets only the operations that match its path
+        files_to_edit = [(source_path, output_path, plan.for_path(relative_path))
+                         for (source_path, output_path, relative_path, is_target), (_, entry, indexed_file) in zip(files, file_states)
+                         if is_target and entry is None and indexed_file is None]
+        edited_files = edit_target_files(files_to_edit, workers, pipeline_depth=pipeline_depth, should_cancel=should_cancel)
+
+        log_writer = LogWriter(output_folder)
+        journal_writer = JournalWriter(output_folder)
+
+        for index, ((source_path, output_path, relative_path, is_target), (source_stat, entry, indexed_file)) in enumerate(zip(files, file_states)):
+            if not summary["cancelled"] and should_cancel is not None and should_cancel():
+                summary["cancelled"] = True
+
+            edited_file = None
+            if summary["cancelled"]:
+                # The files the workers or the pipeline had already started are written anyway, so they're logged and journaled
+                # like the others, files past them keep the output and journal record of the last run
+                if not is_target or entry is not None or indexed_file is not None:
+                    continue
+                edited_file = next(edited_files, None)
+                if edited_file is None:
+                    break
+
+            if entry is not None:
+                # Skipped files reuse their log from the last run, so the log keeps the walk order either way
+                if is_target:
+                    with stats.stage("log"):
+                        log_span = log_writer.write_raw(previous_log.read(entry["log_offset"], entry["log_length"]))
+                    entry = dict(entry, log_offset=log_span[0], log_length=log_span[1])
+                    with stats.stage("journal"):
+                        journal_writer.keep_previous(relative_path)
+                new_manifest[relative_path] = entry
+                summary["skipped"] += 1
+                stats.add("files_skipped")
+            elif indexed_file is not None:
+                # Editing the file would give back the same bytes
+                with stats.stage("passthrough"):
+                    copier.copy(source_path, output_path)
+                with stats.stage("log"):
+                    log_span = log_writer.write(site_index.build_unchanged_log_objects(index_connection, relative_path, source_path))
+                journal_writer.write(relative_path)
+                summary["unchanged"] += 1
+                stats.add("files_unchanged")
+                if incremental:
+                    new_manifest[relative_path] = manifest_entry(source_stat, output_path, fingerprint, indexed_file[1], log_span)
+            elif is_target:
+                file_log_objects, source_hash, file_stats, _, _, journal_entry = edited_file or next(edited_files)
+                stats.merge(file_stats)
+                with stats.stage("log"):
+                    log_span = log_writer.write(file_log_objects)
+                with stats.stage("journal"):
+                    journal_writer.write(relative_path, source_hash, journal_entry)
+                summary["edited"] += 1
+                if incremental:
+                    new_manifest[relative_path] = manifest_entry(source_stat, output_path, fingerprint, source_hash, log_span)
+            else:
+                with stats.stage("passthrough"):
+                    copier.copy(source_path, output_path)
+                summary["copied"] += 1
+                stats.add("files_copied")
+                stats.add("bytes_copied", source_stat.st_size if source_stat is not None else os.path.getsize(source_path))
+                if incremental:
+                    new_manifest[relative_path] = manifest_entry(source_stat, output_path, None)
+
+            if progress_callback is not None:
+                progress_callback(index + 1, total_files, source_path)
+
+    finally:
+        # Also cancels the files still queued in the worker processes
+        if edited_files is not None:
+            edited_files.close()
+        if log_writer is not None:
+            log_writer.close()
+        # The outputs written before a failure are the edited ones, so their records are kept
+        if journal_writer is not None:
+            journal_writer.close()
+        if index_connection is not None:
+            index_connection.close()
+
+    logger.info(f"Log written to {log_writer.path}")
+
+    log_json_path = os.path.join(output_folder, log_json_filename)
+    if pretty_log:
+        with stats.stage("pretty_log"):
+            write_pretty_log(log_writer.path, log_json_path)
+        logger.info(f"Log written to {log_json_path}")
+    elif os.path.isfile(log_json_path):
+        # Don't leave the log of another run behind
+        os.remove(log_json_path)
+
+    summary["passthrough"] = copier.report()
+    if summary["passthrough"]:
+        used_strategies = ", ".join(f"{strategy} ({count} files)" for strategy, count in summary["passthrough"].items())
+        logger.info(f"Passthrough files copied with: {used_strategies}")
+
+    if incremental:
+        with stats.stage("save_manifest"):
+            save_manifest(output_folder, input_folder, target_filename, new_manifest, log_writer.position)
+            if previous_log is not None:
+                previous_log.close()
+        logger.info(f"Skipped {summary['skipped']} unchanged files")
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    summary["stats"] = stats.to_dict()
+    write_run_stats(output_folder, summary["stats"], summary["elapsed"])
+    done_files = summary["edited"] + summary["unchanged"] + summary["copied"] + summary["skipped"]
+    summary["files_per_second"] = done_files / summary["elapsed"] if summary["elapsed"] > 0 else 0.0
+
+    if summary["cancelled"]:
+        logger.warning(f"Cancelled after {done_files} of {total_files} files")
+    logger.info(f"Processed {done_files} files in {summary['elapsed']:.2f}s ({summary['files_per_second']:.1f} files/s)")
+    logger.info(format_stats_table(summary["stats"], summary["elapsed"]))
+
+    return summary
+
+# Edits and copies only "changed_paths" and removes the outputs of "removed_paths", paths relative to the input folder,
+# on top of an output folder a mirror run already brought up to date, for the batches of "watch_folder"
+# "manifest" is what "load_manifest" gave for it and is updated in place
+# Nothing else is looked at: the log objects, manifest entries and journal records of these files are appended
+# to "log.jsonl", "manifest.updates.jsonl" and "undo_journal.bin" after the ones they replace, so a batch costs as much as its files
+# With "pretty_log", "log.json" is written again from the log objects the manifest points at, which does cost as much as the whole log
+# The index of "site_index" isn't used, it's brought up to date by the next run that uses it
+# Returns a summary with how many files were edited, copied and removed, the size of the log, the elapsed time and "stats"
+def apply_edit_plan_to_paths(input_folder, output_folder, target_filename, plan, changed_paths, removed_paths, manifest, workers=1,
+                             passthrough="auto", pretty_log=False, pipeline_depth=4):
+    start_time = time.perf_counter()
+    summary = {"files": 0, "edited": 0, "copied": 0, "removed": 0}
+    stats = RunStats()
+    copier = PassthroughCopier(passthrough)
+    fingerprint = plan.fingerprint()
+
+    # Files gone again since they changed are removed like the others
+    files = []
+    removed_paths = list(removed_paths)
+    for relative_path in changed_paths:
+        source_path = os.path.join(input_folder, relative_path)
+        if not os.path.isfile(source_path):
+            removed_paths.append(relative_path)
+            continue
+        output_path = os.path.join(output_folder, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        files.append((source_path, output_path, relative_path, os.path.basename(relative_path) == target_filename))
+
+    summary["files"] = len(files) + len(removed_paths)
+    manifest_updates = {}
+    journal_records = []
+
+    for relative_path in removed_paths:
+        unlink_output(os.path.join(output_folder, relative_path))
+        if manifest.pop(relative_path, None) is not None:
+            manifest_updates[relative_path] = None
+        if os.path.basename(relative_path) == target_filename:
+            journal_records.append((relative_path, None, None))
+        summary["removed"] += 1
+
+    files_to_edit = [(source_path, output_path, plan.for_path(relative_path)) for source_path, output_path, relative_path, is_target in files if is_target]
+
+    log_writer = None
+    edited_files = None
+    try:
+        edited_files = edit_target_files(files_to_edit, workers, pipeline_depth=pipeline_depth)
+        log_writer = LogWriter(output_folder, append=True)
+
+        for source_path, output_path, relative_path, is_target in files:
+            source_stat = os.stat(source_path)
+            if is_target:
+                file_log_objects, source_hash, file_stats, _, _, journal_entry = next(edited_files)
+                stats.merge(file_stats)
+                with stats.stage("log"):
+                    log_span = log_writer.write(file_log_objects)
+                journal_records.append((relative_path, source_hash, journal_entry))
+                manifest[relative_path] = manifest_entry(source_stat, output_path, fingerprint, source_hash, log_span)
+                summary["edited"] += 1
+            else:
+                with stats.stage("passthrough"):
+                    copier.copy(source_path, output_path)
+                manifest[relative_path] = manifest_entry(source_stat, output_path, None)
+                stats.add("files_copied")
+                stats.add("bytes_copied", source_stat.st_size)
+                summary["copied"] += 1
+            manifest_updates[relative_path] = manifest[relative_path]
+    finally:
+        if edited_files is not None:
+            edited_files.close()
+        if log_writer is not None:
+            log_writer.close()
+
+    # The manifest goes last, a batch that fails before it leaves a log whose size doesn't match, so the next run edits everything again
+    with stats.stage("journal"):
+        append_journal(output_folder, journal_records)
+    with stats.stage("save_manifest"):
+        append_manifest_updates(output_folder, manifest_updates, log_writer.position)
+    summary["log_size"] = log_writer.position
+
+    if pretty_log:
+        with stats.stage("pretty_log"):
+            log_spans = [(entry["log_offset"], entry["log_length"]) for entry in manifest.values() if "log_offset" in entry]
+            write_pretty_log(log_writer.path, os.path.join(output_folder, log_json_filename), log_spans)
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    summary["stats"] = stats.to_dict()
+    write_run_stats(output_folder, summary["stats"], summary["elapsed"])
+    return summary
+
+# Writes only the target files "plan" modifies, with "overlay_manifest.json" listing them, instead of mirroring the whole input folder
+# "overlay" writes them in "output_folder" like "mirror" would, and removes the ones an earlier overlay wrote that aren't modified anymore
+# "zip" and "tar" stream them into "overlay.zip" or "overlay.tar" in "output_folder" instead, along with the manifest
+# The log is written like in "find_and_edit_files", other files are never read and there's no incremental manifest,
+# with "index_path" target files none of whose sites change aren't read either
+# Returns a summary with how many target files were found, modified, unchanged and removed, the elapsed time and "stats"
+def write_overlay(input_folder, output_folder, target_filename, plan, output_mode="overlay", workers=1, progress_callback=None, should_cancel=None,
+                  pretty_log=True, index_path=None, pipeline_depth=4):
+    # Only overlays need the archive modules
+    from overlay import (output_modes, archive_filenames, OverlayArchive, load_overlay_manifest, build_overlay_manifest,
+                         save_overlay_manifest, overlay_manifest_filename)
+    if output_mode not in output_modes:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+
+    start_time = time.perf_counter()
+    summary = {"files": 0, "modified": 0, "unchanged": 0, "removed": 0, "cancelled": False, "output_mode": output_mode, "archive": None}
+    stats = RunStats()
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    with stats.stage("manifest"):
+        previous_files = load_overlay_manifest(output_folder, input_folder, target_filename) if output_mode == "overlay" else {}
+    overlay_files = {}
+
+    # Everything that can fail goes in the "try", so the writers are always closed
+    log_writer = None
+    archive = None
+    index_connection = None
+    edited_files = None
+    try:
+        changed_paths = None
+        if index_path is not None:
+            with stats.stage("index"):
+                import site_index
+                index_connection = site_index.open_index(index_path)
+                site_index.update_index(index_connection, input_folder, target_filename)
+                changed_paths = site_index.find_changed_files(index_connection, plan)
+
+        with stats.stage("walk"):
+            target_files = collect_target_files(input_folder, target_filename)
+        total_files = len(target_files)
+        summary["files"] = total_files
+
+        # Overlays keep the newlines of the source, so the files the index knows none of whose sites change aren't modified
+        unchanged_paths = set()
+        if index_connection is not None:
+            for _, relative_path in target_files:
+                if relative_path not in changed_paths and site_index.find_file(index_connection, relative_path) is not None:
+                    unchanged_paths.add(relative_path)
+
+        worker_mode = "overlay" if output_mode == "overlay" else "archive"
+        files_to_edit = [(source_path, os.path.join(output_folder, relative_path), plan.for_path(relative_path), worker_mode)
+                         for source_path, relative_path in target_files if relative_path not in unchanged_paths]
+        edited_files = edit_target_files(files_to_edit, workers, pipeline_depth=pipeline_depth, should_cancel=should_cancel)
+
+        done_paths = set()
+        # The manifest entry of the archive gets the newest mtime of the files in it, so archives stay reproducible
+        latest_mtime = 0
+        log_writer = LogWriter(output_folder)
+        if output_mode != "overlay":
+            summary["archive"] = os.path.join(output_folder, archive_filenames[output_mode])
+            archive = OverlayArchive(summary["archive"], output_mode)
+
+        for index, (source_path, relative_path) in enumerate(target_files):
+            if not summary["cancelled"] and should_cancel is not None and should_cancel():
+                summary["cancelled"] = True
+
+            edited_file = None
+            if summary["cancelled"]:
+                # The files already started are written anyway, so they go in the manifest like the others
+                if relative_path in unchanged_paths:
+                    continue
+                edited_file = next(edited_files, None)
+                if edited_file is None:
+                    break
+
+            overlay_path = relative_path.replace(os.sep, "/")
+            done_paths.add(overlay_path)
+
+            if relative_path in unchanged_paths:
+                with stats.stage("log"):
+                    log_writer.write(site_index.build_unchanged_log_objects(index_connection, relative_path, source_path))
+                modified = False
+                stats.add("files_unchanged")
+            else:
+                file_log_objects, source_hash, file_stats, modified, output_data, _ = edited_file or next(edited_files)
+                stats.merge(file_stats)
+                with stats.stage("log"):
+                    log_writer.write(file_log_objects)
+
+                if modified:
+                    if archive is not None:
+                        source_mtime = os.stat(source_path).st_mtime
+                        latest_mtime = max(latest_mtime, source_mtime)
+                        with stats.stage("write"):
+                            archive.add(overlay_path, output_data, source_mtime)
+                        size = len(output_data)
+                    else:
+                        size = os.path.getsize(os.path.join(output_folder, relative_path))
+                    overlay_files[overlay_path] = {"source_hash": source_hash, "size": size}
+
+            if modified:
+                summary["modified"] += 1
+            else:
+                summary["unchanged"] += 1
+                if overlay_path in previous_files:
+                    remove_overlay_file(output_folder, overlay_path)
+                    summary["removed"] += 1
+
+            if progress_callback is not None:
+                progress_callback(index + 1, total_files, source_path)
+
+    except BaseException:
+        # The archive is only closed once its manifest is in it, unless the run fails
+        if archive is not None:
+            archive.close()
+        raise
+    finally:
+        if edited_files is not None:
+            edited_files.close()
+        if log_writer is not None:
+            log_writer.close()
+        if index_connection is not None:
+            index_connection.close()
+
+    # Files of the last overlay whose source is gone are removed too, unless the run stopped before getting to them
+    for overlay_path, overlay_file in previous_files.items():
+        if overlay_path in done_paths:
+            continue
+        if summary["cancelled"] and os.path.isfile(os.path.join(input_folder, overlay_path.replace("/", os.sep))):
+            overlay_files[overlay_path] = overlay_file
+        else:
+            remove_overlay_file(output_folder, overlay_path)
+            summary["removed"] += 1
+
+    manifest_data = build_overlay_manifest(input_folder, target_filename, plan, overlay_files)
+    if archive is not None:
+        archive.add(overlay_manifest_filename, manifest_data, latest_mtime)
+        archive.close()
+        logger.info(f"Overlay written to {archive.path}")
+    else:
+        save_overlay_manifest(output_folder, manifest_data)
+
+    log_json_path = os.path.join(output_folder, log_json_filename)
+    if pretty_log:
+        with stats.stage("pretty_log"):
+            write_pretty_log(log_writer.path, log_json_path)
+    elif os.path.isfile(log_json_path):
+        os.remove(log_json_path)
+
+    summary["elapsed"] = time.perf_counter() - start_time
+    summary["stats"] = stats.to_dict()
+    write_run_stats(output_folder, summary["stats"], summary["elapsed"])
+    done_files = summary["modified"] + summary["unchanged"]
+    summary["files_per_second"] = done_files / summary["elapsed"] if summary["elapsed"] > 0 else 0.0
+
+    if summary["cancelled"]:
+        logger.warning(f"Cancelled after {done_files} of {total_files} files")
+    logger.info(f"Modified {summary['modified']} of {done_files} target files, removed {summary['removed']} files of the last overlay, "
+                f"in {summary['elapsed']:.2f}s ({summary['files_per_second']:.1f} files/s)")
+    logger.info(format_stats_table(summary["stats"], summary["elapsed"]))
+
+    return summary
+
+# Removes a file an earlier overlay wrote, and the folders it leaves empty
+def remove_overlay_file(output_folder, overlay_path):
+    output_path = os.path.join(output_folder, overlay_path.replace("/", os.sep))
+    unlink_output(output_path)
+
+    folder = os.path.dirname(output_path)
+    while os.path.normpath(folder) != os.path.normpath(output_folder):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            break
+        folder = os.path.dirname(folder)
+
+# Shows what applying "plan" would change without writing anything, not even the output folder or the log
+# Only the target files are read and scanned, and with "index_path" the ones the index knows won't change aren't read either
+# Returns a summary with how many target files were found, would change and wouldn't, the changed sites,
+# "changes" with the augments added and removed at each site of every changed file and "diff", a unified diff of all the changed lines
+def preview_edit_plan(input_folder, target_filename, plan, workers=1, progress_callback=None, should_cancel=None, index_path=None):
+    start_time = time.perf_counter()
+    summary = {"files": 0, "changed": 0, "unchanged": 0, "sites": 0, "cancelled": False, "changes": []}
+    stats = RunStats()
+    diffs = []
+
+    with stats.stage("walk"):
+        target_files = collect_target_files(input_folder, target_filename)
+    total_files = len(target_files)
+    summary["files"] = total_files
+
+    if index_path is not None:
+        import site_index
+        index_connection = site_index.open_index(index_path)
+        try:
+            # Reading the index is fine, it's not part of the output
+            with stats.stage("index"):
+                site_index.update_index(index_connection, input_folder, target_filename)
+                changed_paths = site_index.find_changed_files(index_connection, plan)
+        finally:
+            index_connection.close()
+    else:
+        changed_paths = None
+
+    files_to_preview = [(source_path, relative_path, plan.for_path(relative_path)) for source_path, relative_path in target_files
+                        if changed_paths is None or relative_path in changed_paths]
+    previewed_files = edit_target_files(files_to_preview, workers, preview_target_file)
+    preview_paths = {relative_path for _, relative_path, _ in files_to_preview}
+
+    try:
+        for index, (source_path, relative_path) in enumerate(target_files):
+            if should_cancel is not None and should_cancel():
+                summary["cancelled"] = True
+                break
+
+            if relative_path in preview_paths:
+                site_changes, file_diff, file_stats = next(previewed_files)
+                stats.merge(file_stats)
+            else:
+                site_changes, file_diff = [], ""
+
+            if file_diff:
+                summary["changed"] += 1
+                summary["sites"] += len(site_changes)
+                summary["changes"].append({"path": relative_path, "sites": site_changes})
+                diffs.append(file_diff)
+            else:
+                summary["unchanged"] += 1
+
+            if progress_callback is not None:
+                progress_callback(index + 1, total_files, source_path)
+    finally:
+        previewed_files.close()
+
+    summary["diff"] = "".join(diffs)
+    summary["elapsed"] = time.perf_counter() - start_time
+    summary["stats"] = stats.to_dict()
+    done_files = summary["changed"] + summary["unchanged"]
+    summary["files_per_second"] = done_files / summary["elapsed"] if summary["elapsed"] > 0 else 0.0
+
+    if summary["cancelled"]:
+        logger.warning(f"Cancelled after {done_files} of {total_files} files")
+    logger.info(f"{summary['sites']} sites would change in {summary['changed']} of {done_files} files, "
+                f"previewed in {summary['elapsed']:.2f}s ({summary['files_per_second']:.1f} files/s)")
+    logger.info(format_stats_table(summary["stats"], summary["elapsed"]))
+
+    return summary
+
+# Walks the input folder in a fixed order, so serial and parallel runs write the same log
+# Creates the output folders on the way, empty ones included, and returns
+# (source_path, output_path, relative_path, is_target) for every file
+def collect_files(input_folder, output_folder, target_filename):
+    files = []
+
+    for folder_path, dirnames, filenames in os.walk(input_folder):
+        dirnames.sort()
+        filenames.sort()
+
         for file_name in filenames:
             source_path = os.path.join(folder_path, file_name)
 
             relative_path = os.path.relpath(source_path, input_folder)
             output_path = os.path.join(output_folder, relative_path)
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            if file_name == target_filename:
-                with open(source_path, 'r', encoding='utf-8') as file:
-                    current_file = file.read()
-
-                edited_file, log_objects = edit_file(current_file, source_path, first_augs, second_augs, log_objects, should_add)
 
-                with open(output_path, 'w', encoding='utf-8') as output_file:
-                    output_file.write(edited_file)
-            else:
-                shutil.copy(source_path, output_path)
+            files.append((source_path, output_path, relative_path, file_name == target_filename))
 
         # Check if the folder is empty and copy it
         if not filenames and not os.path.samefile(folder_path, output_folder):
             output_dir = os.path.join(output_folder, os.path.relpath(folder_path, input_folder))
             os.makedirs(output_dir, exist_ok=True)
 
-    log_json_path = os.path.join(output_folder, "log.json")
-    with open(log_json_path, 'w', encoding='utf-8') as log_file:
-        json.dump(log_objects, log_file, indent=4)
+    return files
+
+# Only the target files, as (source_path, relative_path) in the same order as "collect_files", without creating any folder
+def collect_target_files(input_folder, target_filename):
+    target_files = []
+
+    for folder_path, dirnames, filenames in os.walk(input_folder):
+        dirnames.sort()
+        if target_filename in filenames:
+            source_path = os.path.join(folder_path, target_filename)
+            target_files.append((source_path, os.path.relpath(source_path, input_folder)))
+
+    return target_files
+
+# Yields the result of "edit_function" (by default the log objects of "edit_target_file") for every target file in the same order as "target_files"
+# When "workers" is bigger than 1 (or None, meaning one per CPU) the files are edited in a process pool
+# "target_files" are tuples of the arguments of "edit_function", like (source_path, output_path, file_plan)
+# With a single worker, target files of "edit_target_file" go through "pipelined_edit_target_files" unless "pipeline_depth" is 0
+# Once "should_cancel()" returns True no other file is started, but the files already started are still written and yielded,
+# so the caller has to go on until the results run out to know about every output that was written
+def edit_target_files(target_files, workers=1, edit_function=None, pipeline_depth=0, should_cancel=None):
+    if edit_function is None:
+        edit_function = edit_target_file
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or len(target_files) <= 1:
+        if pipeline_depth > 0 and edit_function is edit_target_file and len(target_files) > 1:
+            yield from pipelined_edit_target_files(target_files, pipeline_depth, should_cancel)
+            return
+        for arguments in target_files:
+            if should_cancel is not None and should_cancel():
+                return
+            yield edit_function(*arguments)
+        return
+
+    # Importing the process pool pulls in most of "multiprocessing", serial runs don't need it
+    from concurrent.futures import ProcessPoolExecutor
+
+    count = len(target_files)
+    chunksize = max(1, min(count // (workers * 4), max_chunk_files))
+    chunks = [target_files[start:start + chunksize] for start in range(0, count, chunksize)]
+
+    executor = ProcessPoolExecutor(max_workers=min(workers, count))
+    try:
+        # Only a few chunks are handed to the workers at a time, so a cancel only waits for the files already started
+        # The results come back in submission order, no matter which worker finishes first
+        futures = deque()
+        next_chunk = 0
+        while True:
+            while next_chunk < len(chunks) and len(futures) < workers * 2 and not (should_cancel is not None and should_cancel()):
+                futures.append(executor.submit(edit_target_chunk, edit_function, chunks[next_chunk]))
+                next_chunk += 1
+            if not futures:
+                return
+            yield from futures.popleft().result()
+    finally:
+        # When the caller stops early (like on an error) the chunks not started yet are dropped
+        executor.shutdown(wait=True, cancel_futures=True)
+
+# Runs in the worker processes, a chunk at a time so each file doesn't need its own round trip
+def edit_target_chunk(edit_function, chunk):
+    return [edit_function(*arguments) for arguments in chunk]
+
+# Same results as "edit_target_file" for every target file, with reading, editing and writing each running in its own thread
+# (see "run_pipeline"), so the next files are read while one is edited and the last one is written
+# The caller keeps going meanwhile, copying the passthrough files and writing the log
+# At most "pipeline_depth" files wait between two stages, which bounds the memory the files read ahead take
+def pipelined_edit_target_files(target_files, pipeline_depth=4, should_cancel=None):
+    # Threads are only started by serial runs that ask for them
+    from pipeline import run_pipeline
+
+    # Target files without an output mode are mirrored, like "edit_target_file" does
+    items = ((tuple(arguments) + ("mirror",))[:4] for arguments in target_files)
+    if should_cancel is not None:
+        items = takewhile(lambda _: not should_cancel(), items)
+    stages = [read_target_file, lambda read_file: transform_target_file(*read_file), finish_mapped_target_file]
+    yield from run_pipeline(items, stages, pipeline_depth)
+
+# Reads, edits and writes a single target file, returning the log objects of that file, the hash of its source, the "RunStats" of the file,
+# whether the output differs from the source, with the "archive" output mode the output itself
+# and with the "mirror" output mode the entry of the undo journal of modified files (see "JournalWriter")
+# The file is memory-mapped and scanned as bytes, and the output is spliced together from the map and the edited sites,
+# so the file is never decoded or copied whole
+# Mirrored files whose newlines writing in text mode would change are decoded instead, to keep the output the same as before,
+# overlays keep the newlines of every file so only files with edited sites are modified
+# "output_mode" is "mirror" to always write "output_path", "overlay" to only write it when the file is modified
+# and "archive" to not write anything and return the output of modified files instead
+# Needs to stay a module level function so it can be pickled for the worker processes
+def edit_target_file(source_path, output_path, file_plan, output_mode="mirror"):
+    read_file = read_target_file((source_path, output_path, file_plan, output_mode))
+    try:
+        return finish_target_file(transform_target_file(*read_file))
+    finally:
+        close_source_buffer(read_file[4])
+
+# Maps the file, or reads it when it can't be mapped or has to be decoded (see "keeps_source_newlines")
+# This is also the read stage of "pipelined_edit_target_files", where the files waiting in the queues are maps instead of copies:
+# their pages are the page cache of the files, which the system can drop and read again, instead of memory of the process
+# (12 files of 30 MB at "pipeline_depth" 4 peaked at 11 MB of process memory instead of 211 MB)
+def read_target_file(arguments):
+    source_path, output_path, file_plan, output_mode = arguments
+    stats = RunStats()
+
+    with open(source_path, 'rb') as file:
+        with stats.stage("read"):
+            source_map = map_file(file)
+
+        if source_map is not None and keeps_source_newlines(source_map, output_mode):
+            stats.add("files_mapped")
+            return source_path, output_path, file_plan, output_mode, source_map, stats
+
+        with stats.stage("read"):
+            source_data = source_map[:] if source_map is not None else file.read()
+        if source_map is not None:
+            source_map.close()
+        return source_path, output_path, file_plan, output_mode, source_data, stats
+
+# The output is spliced from the map, so it's only closed once the output is written
+def close_source_buffer(source_buffer):
+    if isinstance(source_buffer, mmap.mmap):
+        source_buffer.close()
+
+# The last stage of "pipelined_edit_target_files", which writes the output and closes the map of the source
+def finish_mapped_target_file(transformed_file):
+    try:
+        return finish_target_file(transformed_file)
+    finally:
+        close_source_buffer(transformed_file[2])
+
+# Finds the edits of a file already read or mapped in "source_buffer", and what the output is made of:
+# the buffer itself with the spans applied when its newlines are kept, or else the edited text encoded like text mode writes it
+def transform_target_file(source_path, output_path, file_plan, output_mode, source_buffer, stats):
+    if keeps_source_newlines(source_buffer, output_mode):
+        spans, log_objects = find_edit_spans(source_buffer, source_path, file_plan, {}, stats)
+        output_buffer = source_buffer
+        modified = bool(spans)
+        # Only mirrored files can be reverted, see "revert_journal"
+        journal_entry = encode_sites(source_buffer, spans) if modified and output_mode == "mirror" else None
+    else:
+        with stats.stage("decode"):
+            current_file = decode_source(bytes(source_buffer))
+        spans, log_objects = find_edit_spans(current_file, source_path, file_plan, {}, stats)
+        with stats.stage("rewrite"):
+            edited_file = rewrite_spans(current_file, spans)
+            output_buffer = (edited_file if os.linesep == "\n" else edited_file.replace("\n", os.linesep)).encode('utf-8')
+        spans = []
+        # Writing in text mode changes the newlines of these files even when no site does
+        modified = True
+        journal_entry = encode_whole_file(source_buffer, output_buffer) if output_mode == "mirror" else None
+
+    stats.add("files_scanned")
+    stats.add("bytes_read", len(source_buffer))
+    source_hash = hash_bytes(source_buffer)
+
+    return output_path, output_mode, output_buffer, spans, modified, list(log_objects.values()), source_hash, stats, journal_entry
+
+# Writes the output "transform_target_file" found and returns what "edit_target_file" does
+def finish_target_file(transformed_file):
+    output_path, output_mode, output_buffer, spans, modified, log_objects, source_hash, stats, journal_entry = transformed_file
+
+    output_data = None
+    with stats.stage("write"):
+        if output_mode == "archive":
+            if modified:
+                output_file = io.BytesIO()
+                write_spans(output_file, output_buffer, spans)
+                output_data = output_file.getvalue()
+        elif modified or output_mode == "mirror":
+            open_output(output_path, output_mode)
+            with open(output_path, 'wb') as output_file:
+                write_spans(output_file, output_buffer, spans)
+
+    add_written_bytes(stats, output_path, output_mode, modified, output_data)
+
+    return log_objects, source_hash, stats.to_dict(), modified, output_data, journal_entry
+
+# Gets "output_path" ready to be written, overlays only create the folders of the files they write
+def open_output(output_path, output_mode):
+    if output_mode == "overlay":
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    unlink_output(output_path)
+
+def add_written_bytes(stats, output_path, output_mode, modified, output_data):
+    if output_data is not None:
+        stats.add("bytes_written", len(output_data))
+    elif modified or output_mode == "mirror":
+        stats.add("bytes_written", os.path.getsize(output_path))
+    if modified:
+        stats.add("files_modified")
+
+# A read-only map of the whole file, or None when it can't be mapped (empty files can't)
+def map_file(file):
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return None
+
+# Whether the bytes of the file are what writing its decoded text in text mode would give back,
+# so unchanged ranges can be copied as they are
+def keeps_newlines_in_buffer(buffer):
+    if os.linesep == "\n":
+        return buffer.find(b"\r") == -1
+    return lone_newline_regex.search(buffer) is None
+
+# Whether the output is the buffer with the spans applied, newlines included
+# Overlays always keep the newlines of the source, otherwise writing them the way the platform does would modify every file on Windows
+def keeps_source_newlines(buffer, output_mode):
+    return output_mode != "mirror" or keeps_newlines_in_buffer(buffer)
+
+# Writes "buffer" with the spans applied, like "rewrite_spans" does for text
+# The unchanged ranges are written straight from the buffer, only the replacements are encoded
+def write_spans(output_file, buffer, spans):
+    with memoryview(buffer) as view:
+        position = 0
+        for start, end, replacement in sorted(spans):
+            output_file.write(view[position:start])
+            output_file.write(replacement.encode('utf-8'))
+            position = end
+        output_file.write(view[position:])
+
+# Scans a single target file like "edit_target_file" without writing anything
+# Returns the augments each changed site would gain and lose, the unified diff of the file and the "RunStats" of the file
+def preview_target_file(source_path, relative_path, file_plan):
+    stats = RunStats()
+
+    with stats.stage("read"):
+        with open(source_path, 'rb') as file:
+            source_data = file.read()
+
+    with stats.stage("decode"):
+        current_file = decode_source(source_data)
+
+    spans, log_objects = find_edit_spans(current_file, source_path, file_plan, {}, stats)
+    stats.add("files_scanned")
+    stats.add("bytes_read", len(source_data))
+
+    site_changes = []
+    for log_object in log_objects.values():
+        for edited_entry in log_object["edited_entries"]["entries"]:
+            unpacked = edited_entry["unpacked"]
+            edited = edited_entry["edited"]
+            unpacked_augments = unpacked["first_arg_augments"] + unpacked["second_arg_augments"]
+            edited_augments = edited["first_arg_augments"] + edited["second_arg_augments"]
+            site_changes.append({
+                "unit": edited_entry["unit"],
+                "before": unpacked["btl_atel_set_ability"],
+                "after": edited["btl_atel_set_ability"],
+                "added": [augment for augment in edited_augments if augment not in unpacked_augments],
+                "removed": [augment for augment in unpacked_augments if augment not in edited_augments]
+            })
+
+    return site_changes, format_span_diff(current_file, relative_path, spans), stats.to_dict()
+
+# Unified diff of the lines the spans change, with one hunk per line and no context
+# Built straight from the spans, which is much faster than diffing the whole file
+def format_span_diff(current_file, relative_path, spans):
+    if not spans:
+        return ""
 
-    print(f"Log written to {log_json_path}")
+    diff_path = relative_path.replace(os.sep, "/")
+    lines = [f"--- a/{diff_path}\n", f"+++ b/{diff_path}\n"]
 
-# Matches the "entry_pattern" to find all "entryXX" functions 
-# and also checks if "btlAtelSetUnit" and "btlAtelSetAbility" exists
-def edit_file(current_file, source_path, first_augs, second_augs, log_objects, should_add):
-    edited_file = current_file
+    line_number = 1
+    position = 0
+    spans = sorted(spans)
+    index = 0
+    while index < len(spans):
+        start = spans[index][0]
+        line_number += current_file.count("\n", position, start)
+        line_start = current_file.rfind("\n", 0, start) + 1
+        line_end = current_file.find("\n", start)
+        if line_end == -1:
+            line_end = len(current_file)
 
-    matches = re.findall(entry_pattern, current_file)
-    total_entries = len(matches)
-    print(f"Entries in file {source_path}: {total_entries}")
+        # Every span of the same line goes into the same hunk
+        line_spans = []
+        while index < len(spans) and spans[index][0] < line_end:
+            line_spans.append((spans[index][0] - line_start, spans[index][1] - line_start, spans[index][2]))
+            index += 1
+
+        original_line = current_file[line_start:line_end]
+        lines.append(f"@@ -{line_number} +{line_number} @@\n")
+        lines.append(f"-{original_line}\n")
+        lines.append(f"+{rewrite_spans(original_line, line_spans)}\n")
+        position = start
+
+    return "".join(lines)
+
+# Same result as reading the file in text mode, newlines included
+def decode_source(source_data):
+    current_file = source_data.decode('utf-8')
+    if '\r' in current_file:
+        current_file = current_file.replace('\r\n', '\n').replace('\r', '\n')
+    return current_file
+
+# Scans the file for all "entryXX" functions that call both "btlAtelSetUnit" and "btlAtelSetAbility"
+# Every "btlAtelSetAbility" site found becomes a (start, end, replacement) span, applied all at once by "write_spans" or "rewrite_spans"
+# "file_plan" is the "FileEditPlan" of the file and "log_objects" is a dict of log objects keyed by their path
+# The time of each stage and the entries and sites found are added to "stats" when it's given
+def find_edit_spans(current_file, source_path, file_plan, log_objects, stats=None):
+    spans = []
+
+    scan_start = time.perf_counter()
+    entries = list(scan_entries(current_file))
+    total_entries = len(entries)
+    edit_start = time.perf_counter()
+    logger.debug(f"Entries in file {source_path}: {total_entries}")
 
     if total_entries == 0:
         log_entry = {
@@ -63,48 +924,69 @@ def edit_file(current_file, source_path, first_augs, second_augs, log_objects, s
                 "entries": []
             }
         }
-        log_objects.append(log_entry)
+        log_objects[source_path] = log_entry
     else:
-        for match_string in matches:
-            if "btlAtelSetUnit" in match_string and "btlAtelSetAbility" in match_string:
-                edited_file, log_objects = edit_augments(edited_file, match_string, source_path, first_augs, second_augs, log_objects, total_entries, should_add)
-            else:
-                print(f"Could not find entry in file: {source_path}")
-
-    return edited_file, log_objects
-
-# Matches the "set_ability_pattern" and then captures the first and second argument of "btlAtelSetAbility"
-# It will edit the hex values of both arguments to remove the enums passed
-def edit_augments(edited_file, matched_string, source_path, first_augs, second_augs, log_objects, total_entries, should_add):
-    for unit_match in re.finditer(set_unit_pattern, matched_string):
-        unit_number = f"{int(unit_match.group(1))}"
-        set_ability_match = re.search(set_ability_pattern, matched_string)
-        
-        if set_ability_match:
-            # Hexdecimal representation of augments bitfield
-            original_first_augs_hex = set_ability_match.group(1)
-            original_seconds_augs_hex = set_ability_match.group(2)
-
-            print(f'\nUnaltered hex first arg augments: {original_first_augs_hex}')
-            print(f'Unaltered hex second arg augments: {original_seconds_augs_hex}')
-
-            # Decimal representation of augments bitfields, also makes it positive
-            original_first_augs_dec = convert_hex_to_dec(original_first_augs_hex)
-            original_second_augs_dec = convert_hex_to_dec(original_seconds_augs_hex)
-
-            # If the hex comes negative, we want to fix it so we can replace it, even when there's no augments to be added/removed
-            corrected_first_augs_hex = convert_dec_to_compatible_hex(original_first_augs_dec)
-            corrected_seconds_augs_hex = convert_dec_to_compatible_hex(original_second_augs_dec)
-
-            print(f'Corrected hex first arg augments: {corrected_first_augs_hex}')
-            print(f'Corrected hex second arg augments: {corrected_seconds_augs_hex}')
-
-            edited_first_augs_dec, edited_second_augs_dec = modify_orig_augs(original_first_augs_dec, original_second_augs_dec, first_augs, second_augs, should_add)
-
-            edited_first_augs_hex = convert_dec_to_compatible_hex(edited_first_augs_dec)
-            edited_second_augs_hex = convert_dec_to_compatible_hex(edited_second_augs_dec)
-       
-            new_object = {
+        for entry in entries:
+            spans, log_objects = edit_augments(spans, entry, source_path, file_plan, log_objects, total_entries, stats)
+
+    if stats is not None:
+        stats.add_time("scan", edit_start - scan_start)
+        stats.add_time("edit_augments", time.perf_counter() - edit_start)
+        stats.add("entries_matched", total_entries)
+        stats.add("sites_rewritten", len(spans))
+
+    return spans, log_objects
+
+# Builds the edited file with a single join, copying the text between spans untouched
+# Spans must not overlap, each one replaces current_file[start:end] with its replacement
+def rewrite_spans(current_file, spans):
+    if not spans:
+        return current_file
+
+    pieces = []
+    position = 0
+    for start, end, replacement in sorted(spans):
+        pieces.append(current_file[position:start])
+        pieces.append(replacement)
+        position = end
+    pieces.append(current_file[position:])
+
+    return "".join(pieces)
+
+# Takes the first and second argument of every "btlAtelSetAbility" site in the entry
+# It will queue a span that edits the hex values of both arguments with the masks the plan has for the site's unit
+# The time spent naming the augments for the log is added to "stats" as "map_augments", along with how many sites were found and edited
+def edit_augments(spans, entry, source_path, file_plan, log_objects, total_entries, stats=None):
+    for set_ability in entry.abilities:
+        unit_number = f"{set_ability.unit}"
+
+        # Hexdecimal representation of augments bitfield
+        original_first_augs_hex = set_ability.first_arg
+        original_seconds_augs_hex = set_ability.second_arg
+
+        logger.debug(f'Unaltered hex first arg augments: {original_first_augs_hex}')
+        logger.debug(f'Unaltered hex second arg augments: {original_seconds_augs_hex}')
+
+        # Decimal representation of augments bitfields, also makes it positive
+        original_first_augs_dec = convert_hex_to_dec(original_first_augs_hex)
+        original_second_augs_dec = convert_hex_to_dec(original_seconds_augs_hex)
+
+        # If the hex comes negative, we want to fix it so we can replace it, even when there's no augments to be added/removed
+        corrected_first_augs_hex = convert_dec_to_compatible_hex(original_first_augs_dec)
+        corrected_seconds_augs_hex = convert_dec_to_compatible_hex(original_second_augs_dec)
+
+        logger.debug(f'Corrected hex first arg augments: {corrected_first_augs_hex}')
+        logger.debug(f'Corrected hex second arg augments: {corrected_seconds_augs_hex}')
+
+        edited_first_augs_dec, edited_second_augs_dec = modify_orig_augs(original_first_augs_dec, original_second_augs_dec, file_plan.masks_for(set_ability.unit))
+
+        edited_first_augs_hex = convert_dec_to_compatible_hex(edited_first_augs_dec)
+        edited_second_augs_hex = convert_dec_to_compatible_hex(edited_second_augs_dec)
+   
+        # Every site of a file goes into the same log object, looked up by its path
+        log_object = log_objects.get(source_path)
+        if log_object is None:
+            log_object = {
                 "path": source_path,
                 "total_entries": total_entries,
                 "edited_entries": {
@@ -116,97 +998,93 @@ def edit_augments(edited_file, matched_string, source_path, first_augs, second_a
                     "entries": []
                 }
             }
+            log_objects[source_path] = log_object
 
-            # Check if entries are different, we don't want to add stuff that doesn't have any changes
-            index = next((index for index, entry in enumerate(log_objects) if entry["path"] == source_path), None)
-            if original_first_augs_dec != edited_first_augs_dec or original_second_augs_dec != edited_second_augs_dec:
-                edited_entry = {
+        map_start = time.perf_counter()
+        original_first_augs_names = map_augments(original_first_augs_dec, FirstAugment)
+        original_second_augs_names = map_augments(original_second_augs_dec, SecondAugment)
+
+        # Check if entries are different, we don't want to add stuff that doesn't have any changes
+        if original_first_augs_dec != edited_first_augs_dec or original_second_augs_dec != edited_second_augs_dec:
+            edited_entry = {
+                "unit": unit_number,
+                "unpacked": {
+                    "btl_atel_set_ability": f"{corrected_first_augs_hex}, {corrected_seconds_augs_hex}",
+                    "first_arg_augments":  original_first_augs_names,
+                    "second_arg_augments": original_second_augs_names
+                },
+                "edited": {
+                    "btl_atel_set_ability": f"{edited_first_augs_hex}, {edited_second_augs_hex}",
+                    "first_arg_augments": map_augments(edited_first_augs_dec, FirstAugment),
+                    "second_arg_augments": map_augments(edited_second_augs_dec, SecondAugment)
+                }
+            }
+            if stats is not None:
+                stats.add_time("map_augments", time.perf_counter() - map_start)
+                stats.add("sites_edited")
+
+            log_object["edited_entries"]["total"] += 1
+            log_object["edited_entries"]["entries"].append(edited_entry)
+
+            edited_set_ability = f"btlAtelSetAbility({edited_first_augs_hex}, {edited_second_augs_hex})"
+        else:
+            unchanged_entry = {
                     "unit": unit_number,
                     "unpacked": {
                         "btl_atel_set_ability": f"{corrected_first_augs_hex}, {corrected_seconds_augs_hex}",
-                        "first_arg_augments":  map_augments(original_first_augs_dec, FirstAugment),
-                        "second_arg_augments": map_augments(original_second_augs_dec, SecondAugment)
-                    },
-                    "edited": {
-                        "btl_atel_set_ability": f"{edited_first_augs_hex}, {edited_second_augs_hex}",
-                        "first_arg_augments": map_augments(edited_first_augs_dec, FirstAugment),
-                        "second_arg_augments": map_augments(edited_second_augs_dec, SecondAugment)
+                        "first_arg_augments":  original_first_augs_names,
+                        "second_arg_augments": original_second_augs_names
                     }
-                }
+            }
+            if stats is not None:
+                stats.add_time("map_augments", time.perf_counter() - map_start)
 
-                if index is None:
-                    new_object["edited_entries"]["total"] += 1
-                    new_object["edited_entries"]["entries"].append(edited_entry)
-                    log_objects.append(new_object)
-                else:
-                    log_objects[index]["edited_entries"]["total"] += 1
-                    log_objects[index]["edited_entries"]["entries"].append(edited_entry)
-
-                unpacked_set_ability = f"btlAtelSetAbility({original_first_augs_hex}, {original_seconds_augs_hex})"
-                edited_set_ability = f"btlAtelSetAbility({edited_first_augs_hex}, {edited_second_augs_hex})"
-                edited_file = edited_file.replace(unpacked_set_ability, edited_set_ability)
-            else:
-                unchanged_entry = {
-                        "unit": unit_number,
-                        "unpacked": {
-                            "btl_atel_set_ability": f"{corrected_first_augs_hex}, {corrected_seconds_augs_hex}",
-                            "first_arg_augments":  map_augments(original_first_augs_dec, FirstAugment),
-                            "second_arg_augments": map_augments(original_second_augs_dec, SecondAugment)
-                        }
-                }
-                if index is None:
-                    new_object["unchanged_entries"]["total"] += 1
-                    new_object["unchanged_entries"]["entries"].append(unchanged_entry)
-                    log_objects.append(new_object)
-                else:
-                    log_objects[index]["unchanged_entries"]["total"] += 1
-                    log_objects[index]["unchanged_entries"]["entries"].append(unchanged_entry)
-
-                unpacked_set_ability = f"btlAtelSetAbility({original_first_augs_hex}, {original_seconds_augs_hex})"
-                edited_set_ability = f"btlAtelSetAbility({corrected_first_augs_hex}, {corrected_seconds_augs_hex})"
-                edited_file = edited_file.replace(unpacked_set_ability, edited_set_ability)
-        else:
-            print("Did not find match for btlAtelSetAbility")
+            log_object["unchanged_entries"]["total"] += 1
+            log_object["unchanged_entries"]["entries"].append(unchanged_entry)
 
-    return edited_file, log_objects
+            edited_set_ability = f"btlAtelSetAbility({corrected_first_augs_hex}, {corrected_seconds_augs_hex})"
 
-def modify_orig_augs(original_first_augs, original_second_augs, first_augs, second_augs, should_add):
-    edited_first_augs = original_first_augs
-    edited_second_augs = original_second_augs
+        unpacked_set_ability = f"btlAtelSetAbility({original_first_augs_hex}, {original_seconds_augs_hex})"
+        if edited_set_ability != unpacked_set_ability:
+            spans.append((set_ability.start, set_ability.end, edited_set_ability))
 
-    for aug_enum in first_augs:
-        edited_first_augs = modify_bitfield(edited_first_augs, aug_enum.value, should_add)
+    if stats is not None:
+        stats.add("sites", len(entry.abilities))
+
+    return spans, log_objects
+
+# "masks" are the (first_set, first_clear, second_set, second_clear) of every operation of the plan composed together
+def modify_orig_augs(original_first_augs, original_second_augs, masks):
+    first_set, first_clear, second_set, second_clear = masks
+
+    edited_first_augs = modify_bitfield(original_first_augs, first_set, first_clear)
+    edited_second_augs = modify_bitfield(original_second_augs, second_set, second_clear)
 
-    for aug_enum in second_augs:
-        edited_second_augs = modify_bitfield(edited_second_augs, aug_enum.value, should_add)
-   
     return edited_first_augs, edited_second_augs
-    
-def modify_bitfield(original_bitfield, modifying_bitfield, should_add):
-    edited_bitfield = original_bitfield
-
-    if should_add:
-        # Check if modifying bitfield is not present
-        if not (original_bitfield & modifying_bitfield):
-            edited_bitfield = original_bitfield | modifying_bitfield
-    else:
-        # Check if modifying bitfield is present
-        if (original_bitfield & modifying_bitfield) != 0:
-            edited_bitfield = original_bitfield ^ modifying_bitfield
 
-    return edited_bitfield
+# Augments are single bits, so setting or clearing a whole mask is the same as adding or removing them one at a time
+def modify_bitfield(original_bitfield, set_bitfield, clear_bitfield):
+    return apply_masks(original_bitfield, set_bitfield, clear_bitfield)
 
+# Names every augment contained in "augs" with the lookup tables of "decode_augments"
+# Going through each bit is only done when the TRACE level is logged
 def map_augments(augs, aug_enums):
-    print(f'\nTARGETED AUGMENT HEX: {hex(augs)}')
-    mapped_augments = []
-    for aug_enum in aug_enums:
-        aug_full_name = f'{aug_enum.name} ({hex(aug_enum.value)})'
-        if augs & aug_enum.value == aug_enum.value: # Check if augment is contained
-            print(f'{aug_full_name} IS INCLUDED')
-            mapped_augments.append(aug_full_name)
-        else:
-            print(f'{aug_full_name} IS NOT INCLUDED')
-    return mapped_augments
+    if logger.isEnabledFor(TRACE):
+        logger.log(TRACE, f'TARGETED AUGMENT HEX: {hex(augs)}')
+        for aug_enum in aug_enums:
+            aug_full_name = f'{aug_enum.name} ({hex(aug_enum.value)})'
+            if augs & aug_enum.value == aug_enum.value: # Check if augment is contained
+                logger.log(TRACE, f'{aug_full_name} IS INCLUDED')
+            else:
+                logger.log(TRACE, f'{aug_full_name} IS NOT INCLUDED')
+
+    return list(decode_augments(augs, aug_enums))
+
+# 0 only logs warnings, 1 the summary of the run, 2 every file and site and 3 every augment bit of every site
+def configure_logging(verbosity=1):
+    levels = [logging.WARNING, logging.INFO, logging.DEBUG, TRACE]
+    level = levels[max(0, min(verbosity, len(levels) - 1))]
+    logging.basicConfig(level=level, format="%(message)s")
 
 def convert_hex_to_dec(hex):
     if is_negative_hex(hex):
@@ -231,5 +1109,15 @@ if __name__ == "__main__":
     first_augs = [FirstAugment.ACCURACY_BOOST, FirstAugment.PIERCING_MAGICK] # Replace with the desired enum values
     second_augs = [] # Replace with the desired enum values
     should_add = False
+    workers = os.cpu_count() # Replace with the desired number of worker processes, 1 edits the files one at a time
+    incremental = True # Skips files that didn't change since the last run with the same augments
+    verbosity = 1 # 0 only shows warnings, 1 the summary of the run, 2 every file and site, 3 every augment bit
+    plan_path = None # Replace with the path of a JSON/TOML plan file to apply all of its operations instead of the augments above
+    profile_path = None # Replace with a ".prof" path (cProfile) or ".html" path (pyinstrument) to profile the run
 
-    find_and_edit_files(input_folder, output_folder, target_filename, first_augs, second_augs, should_add)
+    configure_logging(verbosity)
+
+    if plan_path is not None:
+        apply_edit_plan(input_folder, output_folder, target_filename, load_plan(plan_path), workers, incremental, profile_path=profile_path)
+    else:
+        find_and_edit_files(input_folder, output_folder, target_filename, first_augs, second_augs, should_add, workers, incremental, profile_path=profile_path)
@@ -0,0 +1,121 @@
+import os
+import json
+import hashlib
+
+manifest_filename = "manifest.json"
+manifest_version = 2
+# Entries changed since "manifest.json" was saved, one JSON line per batch of "watch_folder", see "append_manifest_updates"
+manifest_updates_filename = "manifest.updates.jsonl"
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+def hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Returns the files recorded by the last run and the size of the log it wrote, or an empty dict and None when there's
+# no manifest or it was written for another input folder/target file, since then none of its entries can be trusted
+def load_manifest(output_folder, input_folder, target_filename):
+    manifest_path = os.path.join(output_folder, manifest_filename)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {}, None
+
+    if (manifest.get("version") != manifest_version
+            or manifest.get("input_folder") != input_folder
+            or manifest.get("target_filename") != target_filename):
+        return {}, None
+
+    files = manifest.get("files", {})
+    log_size = manifest.get("log_size")
+
+    # The updates are applied in order, a line cut short by a batch that didn't finish ends them
+    # The log size then doesn't match the log anymore, so the skipped files are edited again instead of trusting their log
+    try:
+        with open(os.path.join(output_folder, manifest_updates_filename), 'r', encoding='utf-8') as updates_file:
+            for line in updates_file:
+                try:
+                    update = json.loads(line)
+                except ValueError:
+                    break
+                for relative_path, entry in update["files"].items():
+                    if entry is None:
+                        files.pop(relative_path, None)
+                    else:
+                        files[relative_path] = entry
+                log_size = update["log_size"]
+    except FileNotFoundError:
+        pass
+
+    return files, log_size
+
+# The updates are removed before the new manifest replaces the old one, so they're never applied to a manifest they weren't made for
+def save_manifest(output_folder, input_folder, target_filename, files, log_size):
+    manifest = {
+        "version": manifest_version,
+        "input_folder": input_folder,
+        "target_filename": target_filename,
+        "log_size": log_size,
+        "files": files
+    }
+
+    manifest_path = os.path.join(output_folder, manifest_filename)
+    with open(manifest_path + ".tmp", 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    try:
+        os.remove(os.path.join(output_folder, manifest_updates_filename))
+    except FileNotFoundError:
+        pass
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+# Adds the entries of the files a batch edited, copied or removed (None) to the saved manifest, with the size of the log after it
+# Only as much as the batch changed is written, the next "save_manifest" folds them back into "manifest.json"
+def append_manifest_updates(output_folder, files, log_size):
+    with open(os.path.join(output_folder, manifest_updates_filename), 'a', encoding='utf-8') as updates_file:
+        updates_file.write(json.dumps({"log_size": log_size, "files": files}) + "\n")
+
+# "fingerprint" is None for files that are only copied, since the augments don't change them
+# Copied files don't get a hash, copying them again costs about the same as hashing them
+# Edited files keep where their log objects are in "log.jsonl", as the (offset, length) of "log_span"
+def manifest_entry(source_stat, output_path, fingerprint, source_hash=None, log_span=None):
+    output_stat = os.stat(output_path)
+    entry = {
+        "size": source_stat.st_size,
+        "mtime_ns": source_stat.st_mtime_ns,
+        "hash": source_hash,
+        "fingerprint": fingerprint,
+        "output_size": output_stat.st_size,
+        "output_mtime_ns": output_stat.st_mtime_ns
+    }
+    if log_span is not None:
+        entry["log_offset"], entry["log_length"] = log_span
+    return entry
+
+# Returns the manifest entry when the file can be skipped, otherwise None
+# The output must still be the one this tool wrote, and the source must have the same size and mtime
+# A source that was only touched (like when it's extracted again) is skipped if its hash didn't change
+def find_unchanged_entry(manifest, relative_path, source_path, source_stat, output_path, fingerprint):
+    entry = manifest.get(relative_path)
+    if entry is None or entry["fingerprint"] != fingerprint or entry["size"] != source_stat.st_size:
+        return None
+
+    try:
+        output_stat = os.stat(output_path)
+    except FileNotFoundError:
+        return None
+
+    if output_stat.st_size != entry["output_size"] or output_stat.st_mtime_ns != entry["output_mtime_ns"]:
+        return None
+
+    if entry["mtime_ns"] != source_stat.st_mtime_ns:
+        if entry["hash"] is None or hash_file(source_path) != entry["hash"]:
+            return None
+        entry = dict(entry, mtime_ns=source_stat.st_mtime_ns)
+
+    return entry
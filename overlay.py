@@ -0,0 +1,76 @@
+import os
+import io
+import json
+import time
+import tarfile
+import zipfile
+
+overlay_manifest_filename = "overlay_manifest.json"
+overlay_manifest_version = 1
+
+# "mirror" copies the whole input folder, the others only write the target files the edit modifies
+output_modes = ["mirror", "overlay", "zip", "tar"]
+archive_filenames = {"zip": "overlay.zip", "tar": "overlay.tar"}
+
+# Returns the files the last overlay wrote in "output_folder", keyed by their path relative to it,
+# or an empty dict when there's no manifest or it's from another input folder/target file
+def load_overlay_manifest(output_folder, input_folder, target_filename):
+    manifest_path = os.path.join(output_folder, overlay_manifest_filename)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+    if (manifest.get("version") != overlay_manifest_version
+            or manifest.get("input_folder") != input_folder
+            or manifest.get("target_filename") != target_filename):
+        return {}
+
+    return manifest.get("files", {})
+
+# Lists the modified files so the repack step knows what to take, with the plan that made them
+def build_overlay_manifest(input_folder, target_filename, plan, files):
+    manifest = {
+        "version": overlay_manifest_version,
+        "input_folder": input_folder,
+        "target_filename": target_filename,
+        "plan": plan.to_dict(),
+        "files": dict(sorted(files.items()))
+    }
+    return json.dumps(manifest, indent=4).encode('utf-8')
+
+def save_overlay_manifest(output_folder, manifest_data):
+    with open(os.path.join(output_folder, overlay_manifest_filename), 'wb') as manifest_file:
+        manifest_file.write(manifest_data)
+
+# Writes the modified files straight into a zip or tar archive as they come, instead of into the output folder
+# Entries get the mtime of their source, so the same edit of the same files gives the same archive
+class OverlayArchive:
+    def __init__(self, path, archive_format):
+        self.path = path
+        self.archive_format = archive_format
+        if archive_format == "zip":
+            self.archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif archive_format == "tar":
+            self.archive = tarfile.open(path, 'w', format=tarfile.PAX_FORMAT)
+        else:
+            raise ValueError(f"Unknown archive format: {archive_format}")
+
+    def add(self, archive_path, data, mtime):
+        if self.archive_format == "zip":
+            # Zip can't store dates before 1980
+            date_time = time.localtime(max(mtime, 315532800))[:6]
+            entry = zipfile.ZipInfo(archive_path, date_time)
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            entry.external_attr = 0o644 << 16
+            self.archive.writestr(entry, data)
+        else:
+            entry = tarfile.TarInfo(archive_path)
+            entry.size = len(data)
+            entry.mtime = int(mtime)
+            entry.mode = 0o644
+            self.archive.addfile(entry, io.BytesIO(data))
+
+    def close(self):
+        self.archive.close()
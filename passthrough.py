@@ -0,0 +1,114 @@
+import os
+import errno
+import shutil
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+# Linux ioctl that makes the output share the source's blocks until either one is written to (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+# Every strategy, fastest first
+# Hardlinks are only ever made for files this tool doesn't edit, and outputs are always unlinked before being written,
+# so writing an edited file never goes through to the source
+passthrough_strategies = ["reflink", "hardlink", "copy_file_range", "sendfile", "copy"]
+
+# What "auto" tries, in this order
+# Hardlinks are left out: the output would share the source's inode, and any other tool writing the output in place
+# would change the source too, so they have to be asked for
+auto_strategies = ["reflink", "copy_file_range", "sendfile", "copy"]
+
+def reflink_file(source_path, output_path):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+
+    with open(source_path, 'rb') as source_file, open(output_path, 'wb') as output_file:
+        fcntl.ioctl(output_file.fileno(), FICLONE, source_file.fileno())
+    shutil.copymode(source_path, output_path)
+
+def hardlink_file(source_path, output_path):
+    os.link(source_path, output_path)
+
+def copy_file_range_file(source_path, output_path):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.ENOSYS, "copy_file_range is not supported on this platform")
+
+    with open(source_path, 'rb') as source_file, open(output_path, 'wb') as output_file:
+        remaining = os.fstat(source_file.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(source_file.fileno(), output_file.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+    shutil.copymode(source_path, output_path)
+
+def sendfile_file(source_path, output_path):
+    if not hasattr(os, "sendfile"):
+        raise OSError(errno.ENOSYS, "sendfile is not supported on this platform")
+
+    with open(source_path, 'rb') as source_file, open(output_path, 'wb') as output_file:
+        remaining = os.fstat(source_file.fileno()).st_size
+        offset = 0
+        while remaining > 0:
+            sent = os.sendfile(output_file.fileno(), source_file.fileno(), offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+    shutil.copymode(source_path, output_path)
+
+def copy_file(source_path, output_path):
+    shutil.copy(source_path, output_path)
+
+strategy_functions = {
+    "reflink": reflink_file,
+    "hardlink": hardlink_file,
+    "copy_file_range": copy_file_range_file,
+    "sendfile": sendfile_file,
+    "copy": copy_file
+}
+
+# Removes whatever is at "output_path", so the next write creates a new file instead of
+# writing into a file that may be a hardlink to the source
+def unlink_output(output_path):
+    try:
+        os.unlink(output_path)
+    except FileNotFoundError:
+        pass
+
+# Copies files that are passed through unchanged with the first strategy that works
+# "auto" starts with the fastest one that gives the output its own file, any other strategy falls back to a plain copy
+# A strategy that fails once is not tried again for the rest of the run, the whole tree is usually on the same file system
+class PassthroughCopier:
+    def __init__(self, strategy="auto"):
+        if strategy == "auto":
+            self.strategies = list(auto_strategies)
+        elif strategy in strategy_functions:
+            self.strategies = [strategy] if strategy == "copy" else [strategy, "copy"]
+        else:
+            raise ValueError(f"Unknown passthrough strategy: {strategy}")
+
+        self.counts = {}
+
+    def copy(self, source_path, output_path):
+        unlink_output(output_path)
+
+        while True:
+            strategy = self.strategies[0]
+            try:
+                strategy_functions[strategy](source_path, output_path)
+            except OSError:
+                if strategy == "copy":
+                    raise
+                unlink_output(output_path)
+                self.strategies.pop(0)
+                continue
+
+            self.counts[strategy] = self.counts.get(strategy, 0) + 1
+            return strategy
+
+    # Which strategies ended up being used and for how many files
+    def report(self):
+        return dict(self.counts)
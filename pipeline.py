@@ -0,0 +1,85 @@
+import queue
+import threading
+
+# Put between the results to mark the end of the items
+end_of_items = object()
+
+# An exception raised by a stage, passed along the next stages untouched and raised by "run_pipeline"
+class StageFailure:
+    def __init__(self, error):
+        self.error = error
+
+# Runs every item through "stages" one after the other, each stage in its own thread, and yields the results in the order of "items"
+# The stages are connected by queues of at most "depth" items, so a fast stage can only get that far ahead of a slow one
+# and memory stays bounded, while a stage waiting on the disk lets the others work
+# Stopping early (closing the generator) stops the threads before the next item
+def run_pipeline(items, stages, depth=4):
+    stop_event = threading.Event()
+    queues = [queue.Queue(maxsize=depth) for _ in stages]
+
+    def put(output_queue, value):
+        # Waits for room without missing a stop
+        while not stop_event.is_set():
+            try:
+                output_queue.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(input_queue):
+        while not stop_event.is_set():
+            try:
+                return input_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return end_of_items
+
+    def run_first_stage():
+        stage = stages[0]
+        try:
+            for item in items:
+                if stop_event.is_set():
+                    return
+                try:
+                    value = stage(item)
+                except BaseException as error:
+                    value = StageFailure(error)
+                if not put(queues[0], value):
+                    return
+        except BaseException as error:
+            put(queues[0], StageFailure(error))
+        put(queues[0], end_of_items)
+
+    def run_stage(index):
+        stage = stages[index]
+        while True:
+            value = get(queues[index - 1])
+            if value is end_of_items:
+                put(queues[index], end_of_items)
+                return
+            if not isinstance(value, StageFailure):
+                try:
+                    value = stage(value)
+                except BaseException as error:
+                    value = StageFailure(error)
+            if not put(queues[index], value):
+                return
+
+    threads = [threading.Thread(target=run_first_stage, name="pipeline-stage-0", daemon=True)]
+    threads += [threading.Thread(target=run_stage, args=(index,), name=f"pipeline-stage-{index}", daemon=True) for index in range(1, len(stages))]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            value = queues[-1].get()
+            if value is end_of_items:
+                return
+            if isinstance(value, StageFailure):
+                raise value.error
+            yield value
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,196 @@
+import os
+import json
+import hashlib
+from bisect import bisect_right
+from fnmatch import fnmatchcase
+from collections import namedtuple
+from augments import augment_masks, selection_masks
+
+plan_actions = ("add", "remove")
+
+# "units" is a sorted tuple of (first, last) unit ranges that don't touch each other (see "parse_units") and "paths" a tuple of glob patterns,
+# None means the operation applies to all of them
+PlanOperation = namedtuple("PlanOperation", ["action", "first_mask", "second_mask", "units", "paths"])
+
+# An ordered list of add/remove operations, applied to every site in a single pass
+# Each site gets the operations that match its file and unit composed into one set/clear mask per argument,
+# which gives the same result as applying the operations one after the other
+class EditPlan:
+    def __init__(self, operations):
+        self.operations = list(operations)
+
+    # The plan of a single edit, like the GUI makes
+    @classmethod
+    def from_augments(cls, first_augs, second_augs, should_add):
+        first_mask, second_mask = augment_masks(list(first_augs) + list(second_augs))
+        return cls([PlanOperation("add" if should_add else "remove", first_mask, second_mask, None, None)])
+
+    # The same from augment names, like the selected checkboxes of the window
+    @classmethod
+    def from_selection(cls, aug_names, should_add):
+        first_mask, second_mask = selection_masks(aug_names)
+        return cls([PlanOperation("add" if should_add else "remove", first_mask, second_mask, None, None)])
+
+    # Only the operations for a file, matched by its path relative to the input folder
+    # This is what's sent to the worker processes, so it's resolved once per file
+    def for_path(self, relative_path):
+        plan_path = relative_path.replace(os.sep, "/")
+        return FileEditPlan([operation for operation in self.operations
+                             if operation.paths is None or any(fnmatchcase(plan_path, pattern) for pattern in operation.paths)])
+
+    # The masks for every site, or None when some operation only applies to some units or paths
+    def global_masks(self):
+        if any(operation.units is not None or operation.paths is not None for operation in self.operations):
+            return None
+        return compose_masks(self.operations)
+
+    def to_dict(self):
+        return {"operations": [operation_to_dict(operation) for operation in self.operations]}
+
+    # Identifies what the plan does, for the incremental manifest
+    def fingerprint(self):
+        return hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode('utf-8')).hexdigest()
+
+# The operations of an "EditPlan" that apply to one file, the masks of each unit are worked out once
+class FileEditPlan:
+    def __init__(self, operations):
+        self.operations = operations
+        self.unit_masks = {}
+
+    # (first_set, first_clear, second_set, second_clear) for the sites of "unit"
+    def masks_for(self, unit):
+        masks = self.unit_masks.get(unit)
+        if masks is None:
+            masks = compose_masks([operation for operation in self.operations if operation.units is None or units_contain(operation.units, unit)])
+            self.unit_masks[unit] = masks
+        return masks
+
+# Folds the operations, in order, into bits to set and bits to clear
+# Adding sets the bits and forgets clearing them, removing does the opposite, so later operations win
+def compose_masks(operations):
+    first_set = first_clear = second_set = second_clear = 0
+    for operation in operations:
+        if operation.action == "add":
+            first_set, first_clear = first_set | operation.first_mask, first_clear & ~operation.first_mask
+            second_set, second_clear = second_set | operation.second_mask, second_clear & ~operation.second_mask
+        else:
+            first_set, first_clear = first_set & ~operation.first_mask, first_clear | operation.first_mask
+            second_set, second_clear = second_set & ~operation.second_mask, second_clear | operation.second_mask
+    return first_set, first_clear, second_set, second_clear
+
+def apply_masks(bitfield, set_mask, clear_mask):
+    return (bitfield & ~clear_mask) | set_mask
+
+# Reads a plan file, JSON or TOML (Python 3.11+) by its extension, like:
+#
+# [[operations]]
+# action = "remove"
+# augments = ["ACCURACY_BOOST"]
+#
+# [[operations]]
+# action = "add"
+# augments = ["STABILITY"]
+# units = ["12-40"]
+# paths = ["battle/area01/*"]
+def load_plan(plan_path):
+    if plan_path.lower().endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("TOML plans need Python 3.11 or newer, use a JSON plan instead")
+        with open(plan_path, 'rb') as plan_file:
+            plan_data = tomllib.load(plan_file)
+    else:
+        with open(plan_path, 'r', encoding='utf-8') as plan_file:
+            plan_data = json.load(plan_file)
+
+    return plan_from_dict(plan_data)
+
+def plan_from_dict(plan_data):
+    operations = plan_data.get("operations") if isinstance(plan_data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("A plan needs a non-empty list of \"operations\"")
+
+    plan_operations = []
+    for number, operation in enumerate(operations, 1):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {number}: must be a table of \"action\", \"augments\", \"units\" and \"paths\"")
+
+        action = operation.get("action")
+        if action not in plan_actions:
+            raise ValueError(f"Operation {number}: \"action\" must be one of {', '.join(plan_actions)}")
+
+        aug_names = operation.get("augments")
+        if not isinstance(aug_names, list) or not aug_names or not all(isinstance(aug_name, str) for aug_name in aug_names):
+            raise ValueError(f"Operation {number}: \"augments\" must be a non-empty list of augment names")
+
+        try:
+            first_mask, second_mask = selection_masks(aug_names)
+            units = parse_units(operation["units"]) if "units" in operation else None
+        except ValueError as error:
+            raise ValueError(f"Operation {number}: {error}")
+
+        paths = operation.get("paths")
+        if paths is not None:
+            if isinstance(paths, str):
+                paths = [paths]
+            if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+                raise ValueError(f"Operation {number}: \"paths\" must be a glob pattern or a non-empty list of them")
+            paths = tuple(paths)
+
+        plan_operations.append(PlanOperation(action, first_mask, second_mask, units, paths))
+
+    return EditPlan(plan_operations)
+
+# Unit ranges from a list of numbers and "first-last" ranges, like [3, "12-40"], as the sorted (first, last) ranges of "PlanOperation"
+# Ranges are kept as they are instead of listing their units, so "0-100000000" costs as little as "3"
+def parse_units(units):
+    if isinstance(units, (int, str)):
+        units = [units]
+
+    if not isinstance(units, list) or not units:
+        raise ValueError("\"units\" must be a unit number, a \"first-last\" range or a non-empty list of them")
+
+    unit_ranges = []
+    for unit in units:
+        # JSON and TOML give booleans for true and false, which Python would take for 1 and 0
+        if isinstance(unit, bool) or not isinstance(unit, (int, str)):
+            raise ValueError(f"Invalid unit: {unit!r}")
+        if isinstance(unit, int):
+            first = last = unit
+        else:
+            first, separator, last = unit.partition("-")
+            try:
+                first = int(first)
+                last = int(last) if separator else first
+            except ValueError:
+                raise ValueError(f"Invalid unit: {unit}")
+        if first < 0 or last < first:
+            raise ValueError(f"Invalid unit: {unit}")
+        unit_ranges.append((first, last))
+
+    # Overlapping and adjacent ranges are merged, so each unit is in a single range
+    merged_ranges = []
+    for first, last in sorted(unit_ranges):
+        if merged_ranges and first <= merged_ranges[-1][1] + 1:
+            merged_ranges[-1] = (merged_ranges[-1][0], max(merged_ranges[-1][1], last))
+        else:
+            merged_ranges.append((first, last))
+    return tuple(merged_ranges)
+
+# Whether "unit" is in one of the ranges "parse_units" gave
+def units_contain(unit_ranges, unit):
+    index = bisect_right(unit_ranges, (unit, float("inf"))) - 1
+    return index >= 0 and unit <= unit_ranges[index][1]
+
+def operation_to_dict(operation):
+    operation_dict = {
+        "action": operation.action,
+        "first_mask": operation.first_mask,
+        "second_mask": operation.second_mask
+    }
+    if operation.units is not None:
+        operation_dict["units"] = [list(unit_range) for unit_range in operation.units]
+    if operation.paths is not None:
+        operation_dict["paths"] = list(operation.paths)
+    return operation_dict
@@ -0,0 +1,156 @@
+import re
+from collections import namedtuple
+
+# Call sites found inside an "entryXX" function, offsets are relative to the scanned text
+UnitCall = namedtuple("UnitCall", ["unit", "start", "end"])
+AbilityCall = namedtuple("AbilityCall", ["unit", "first_arg", "second_arg", "start", "end"])
+
+# "start" and "end" delimit the body of the entry, between its braces
+Entry = namedtuple("Entry", ["name", "start", "end", "units", "abilities"])
+
+# Strings and comments, matched only to be skipped, braces and calls inside them don't count
+# Buffers keep the newlines of the file, so a line also ends at a "\r" on its own
+skipped_pattern = r'"(?:[^"\\\r\n]|\\.)*"|//[^\r\n]*|/\*.*?\*/'
+
+# Every token the scanner cares about in a single alternation, for the bodies that have strings or comments
+# No branch starts with a group, otherwise "re" can't skip ahead to the possible first characters and gets much slower
+token_pattern = (
+    skipped_pattern +
+    r'|entry(?P<entry>[0-9]+)\(\)\s*\{'
+    r'|\{|\}'
+    r'|btlAtelSetUnit\((?P<unit>[0-9]+)\)'
+    r'|btlAtelSetAbility\((?P<first_arg>-?(?:0x[0-9a-fA-F]+|0)), (?P<second_arg>-?(?:0x[0-9a-fA-F]+|0))\)'
+)
+
+token_regex = re.compile(token_pattern, re.DOTALL)
+token_regex_bytes = re.compile(token_pattern.encode("ascii"), re.DOTALL)
+
+# Entries are found by their header alone and only their bodies are searched for calls, both patterns start with a literal,
+# which "re" searches for much faster than the alternation of "token_pattern"
+header_pattern = r'entry(?P<entry>[0-9]+)\(\)\s*\{'
+call_pattern = (
+    r'btlAtelSet(?:Unit\((?P<unit>[0-9]+)\)'
+    r'|Ability\((?P<first_arg>-?(?:0x[0-9a-fA-F]+|0)), (?P<second_arg>-?(?:0x[0-9a-fA-F]+|0))\))'
+)
+
+header_regex = re.compile(header_pattern)
+header_regex_bytes = re.compile(header_pattern.encode("ascii"))
+call_regex = re.compile(call_pattern)
+call_regex_bytes = re.compile(call_pattern.encode("ascii"))
+
+# Where a comment may start, a slash alone is a division
+comment_start_regex = re.compile(r'/[/*]')
+comment_start_regex_bytes = re.compile(rb'/[/*]')
+
+# Strings, comments and headers, to find the next header that isn't in a string or a comment
+gap_regex = re.compile(skipped_pattern + "|" + header_pattern, re.DOTALL)
+gap_regex_bytes = re.compile((skipped_pattern + "|" + header_pattern).encode("ascii"), re.DOTALL)
+
+# Yields every "entryXX()" function that calls both "btlAtelSetUnit" and "btlAtelSetAbility"
+# Works on str, bytes or any buffer (like mmap), offsets are in characters or bytes accordingly
+# Braces are counted with plain substring searches, so entries with nested blocks are found whole,
+# and the few bodies with strings or comments are walked token by token instead so braces and calls inside them don't count
+def scan_entries(text):
+    is_text = isinstance(text, str)
+    headers = header_regex if is_text else header_regex_bytes
+    calls = call_regex if is_text else call_regex_bytes
+    open_brace, close_brace = ("{", "}") if is_text else (b"{", b"}")
+    ability_name = "btlAtelSetAbility" if is_text else b"btlAtelSetAbility"
+
+    # Most sections never set abilities, a plain substring search is enough to rule them out
+    if text.find(ability_name) == -1:
+        return
+
+    position = 0
+    while True:
+        header = headers.search(text, position)
+        if header is None:
+            return
+
+        # A header in a string or a comment isn't one, past the first of them strings and comments are matched along with the headers
+        if find_skipped_start(text, position, header.start()) != -1:
+            header = next((token for token in (gap_regex if is_text else gap_regex_bytes).finditer(text, position) if token.lastgroup == "entry"), None)
+            if header is None:
+                return
+
+        # Each brace opened inside the body moves its end past one more closing brace
+        entry_start = header.end()
+        entry_end = text.find(close_brace, entry_start)
+        next_open = text.find(open_brace, entry_start, entry_end)
+        while next_open != -1 and entry_end != -1:
+            entry_end = text.find(close_brace, entry_end + 1)
+            next_open = text.find(open_brace, next_open + 1, entry_end)
+
+        if find_skipped_start(text, entry_start, entry_end if entry_end != -1 else len(text)) != -1:
+            # Braces in the strings or comments of the body would be counted too
+            entry_end, units, abilities = scan_body_tokens(text, entry_start)
+        elif entry_end != -1 and text.find(ability_name, entry_start, entry_end) != -1:
+            units = []
+            abilities = []
+            for match in calls.finditer(text, entry_start, entry_end):
+                unit, first_arg, second_arg = match.groups()
+                if unit is not None:
+                    units.append(UnitCall(int(unit), match.start(), match.end()))
+                else:
+                    if not is_text:
+                        first_arg = first_arg.decode("ascii")
+                        second_arg = second_arg.decode("ascii")
+                    abilities.append(AbilityCall(units[-1].unit if units else None, first_arg, second_arg, match.start(), match.end()))
+        else:
+            # Entries without any ability are common and have nothing to edit, whatever units they set
+            units = abilities = None
+
+        if entry_end == -1:
+            # Never closed
+            return
+        position = entry_end + 1
+        if units and abilities:
+            number = header.group("entry")
+            yield Entry("entry" + (number if is_text else number.decode("ascii")), entry_start, entry_end, units, close_abilities(units, abilities))
+
+# Where the first string or comment between "start" and "end" starts, or -1
+def find_skipped_start(text, start, end):
+    is_text = isinstance(text, str)
+    quote_start = text.find('"' if is_text else b'"', start, end)
+    comment_start = (comment_start_regex if is_text else comment_start_regex_bytes).search(text, start, end if quote_start == -1 else quote_start)
+    return comment_start.start() if comment_start is not None else quote_start
+
+# Walks the tokens of "token_pattern" from the start of a body to its closing brace, skipping strings and comments
+# Returns where the body ends, or -1 when it never does, and the unit and ability calls in it
+def scan_body_tokens(text, entry_start):
+    is_text = isinstance(text, str)
+    open_brace, close_brace = ("{", "}") if is_text else (b"{", b"}")
+
+    depth = 1
+    units = []
+    abilities = []
+    for match in (token_regex if is_text else token_regex_bytes).finditer(text, entry_start):
+        kind = match.lastgroup
+
+        if kind is None:
+            token = match.group()
+            if token == open_brace:
+                depth += 1
+            elif token == close_brace:
+                depth -= 1
+                if depth == 0:
+                    return match.start(), units, abilities
+        elif kind == "entry":
+            depth += 1
+        elif kind == "unit":
+            units.append(UnitCall(int(match.group("unit")), match.start(), match.end()))
+        else:
+            first_arg = match.group("first_arg")
+            second_arg = match.group("second_arg")
+            if not is_text:
+                first_arg = first_arg.decode("ascii")
+                second_arg = second_arg.decode("ascii")
+            abilities.append(AbilityCall(units[-1].unit if units else None, first_arg, second_arg, match.start(), match.end()))
+    return -1, units, abilities
+
+# Sites called before any "btlAtelSetUnit" are given to the first unit of the entry
+def close_abilities(units, abilities):
+    if abilities[0].unit is not None:
+        return abilities
+    first_unit = units[0].unit
+    return [ability if ability.unit is not None else ability._replace(unit=first_unit) for ability in abilities]
@@ -0,0 +1,279 @@
+import os
+import sys
+import sqlite3
+import argparse
+from augments import FirstAugment, SecondAugment, decode_augments, augment_from_name, augment_masks, selection_masks
+from scanner import scan_entries
+from manifest import hash_bytes
+from main import convert_hex_to_dec, convert_dec_to_compatible_hex
+from plan import apply_masks
+
+index_version = 2
+default_index_path = "augments_index.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    total_entries INTEGER NOT NULL,
+    newlines TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    entry TEXT NOT NULL,
+    unit INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    first_arg TEXT NOT NULL,
+    second_arg TEXT NOT NULL,
+    first_augs INTEGER NOT NULL,
+    second_augs INTEGER NOT NULL,
+    canonical INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sites_file_id ON sites (file_id, start);
+CREATE INDEX IF NOT EXISTS sites_unit ON sites (unit);
+"""
+
+# Keeps one row per "btlAtelSetAbility" site of every target file in the input folder, so questions about the augments
+# are answered without reading the game files again
+# Sites have their byte offsets in the file, the arguments as written ("first_arg"/"second_arg") and decoded ("first_augs"/"second_augs"),
+# and "canonical" tells if the arguments are already written the way this tool writes them
+def open_index(index_path=default_index_path):
+    connection = sqlite3.connect(index_path)
+    connection.executescript(schema)
+    return connection
+
+# Brings the index up to date with the input folder, only reading the files whose size or mtime changed
+# and only scanning again the ones whose hash changed too
+# Returns how many target files were found, indexed, unchanged and removed
+def update_index(connection, input_folder, target_filename):
+    summary = {"files": 0, "indexed": 0, "unchanged": 0, "removed": 0}
+
+    with connection:
+        # An index built for another folder or target file can't be updated, only rebuilt
+        meta = dict(connection.execute("SELECT key, value FROM meta"))
+        if meta != {"version": str(index_version), "input_folder": input_folder, "target_filename": target_filename}:
+            connection.execute("DELETE FROM sites")
+            connection.execute("DELETE FROM files")
+            connection.execute("DELETE FROM meta")
+            connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", [
+                ("version", str(index_version)),
+                ("input_folder", input_folder),
+                ("target_filename", target_filename)
+            ])
+
+        known_files = {path: (file_id, size, mtime_ns, source_hash) for path, file_id, size, mtime_ns, source_hash
+                       in connection.execute("SELECT path, id, size, mtime_ns, hash FROM files")}
+        found_paths = set()
+
+        for folder_path, dirnames, filenames in os.walk(input_folder):
+            dirnames.sort()
+            if target_filename not in filenames:
+                continue
+
+            source_path = os.path.join(folder_path, target_filename)
+            relative_path = os.path.relpath(source_path, input_folder)
+            found_paths.add(relative_path)
+            summary["files"] += 1
+
+            source_stat = os.stat(source_path)
+            known_file = known_files.get(relative_path)
+            if known_file is not None and known_file[1] == source_stat.st_size and known_file[2] == source_stat.st_mtime_ns:
+                summary["unchanged"] += 1
+                continue
+
+            with open(source_path, 'rb') as file:
+                source_data = file.read()
+            source_hash = hash_bytes(source_data)
+
+            if known_file is not None and known_file[3] == source_hash:
+                connection.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?", (source_stat.st_size, source_stat.st_mtime_ns, known_file[0]))
+                summary["unchanged"] += 1
+                continue
+
+            index_file(connection, known_file[0] if known_file is not None else None, relative_path, source_stat, source_data, source_hash)
+            summary["indexed"] += 1
+
+        for relative_path in known_files.keys() - found_paths:
+            file_id = known_files[relative_path][0]
+            connection.execute("DELETE FROM sites WHERE file_id = ?", (file_id,))
+            connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+            summary["removed"] += 1
+
+    return summary
+
+def index_file(connection, file_id, relative_path, source_stat, source_data, source_hash):
+    entries = list(scan_entries(source_data))
+    file_row = (source_stat.st_size, source_stat.st_mtime_ns, source_hash, len(entries), detect_newlines(source_data))
+
+    if file_id is None:
+        file_id = connection.execute("INSERT INTO files (size, mtime_ns, hash, total_entries, newlines, path) VALUES (?, ?, ?, ?, ?, ?)",
+                                     file_row + (relative_path,)).lastrowid
+    else:
+        connection.execute("UPDATE files SET size = ?, mtime_ns = ?, hash = ?, total_entries = ?, newlines = ? WHERE id = ?", file_row + (file_id,))
+        connection.execute("DELETE FROM sites WHERE file_id = ?", (file_id,))
+
+    site_rows = []
+    for entry in entries:
+        for set_ability in entry.abilities:
+            first_augs = convert_hex_to_dec(set_ability.first_arg)
+            second_augs = convert_hex_to_dec(set_ability.second_arg)
+            canonical = (set_ability.first_arg == convert_dec_to_compatible_hex(first_augs)
+                         and set_ability.second_arg == convert_dec_to_compatible_hex(second_augs))
+            site_rows.append((file_id, entry.name, set_ability.unit, set_ability.start, set_ability.end,
+                              set_ability.first_arg, set_ability.second_arg, first_augs, second_augs, int(canonical)))
+
+    connection.executemany("INSERT INTO sites (file_id, entry, unit, start, end, first_arg, second_arg, first_augs, second_augs, canonical) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", site_rows)
+
+# "none", "lf", "crlf" or "mixed", the edited files are written in text mode, which changes the newlines
+# unless the file already uses the ones of this system
+def detect_newlines(source_data):
+    line_feeds = source_data.count(b"\n")
+    carriage_returns = source_data.count(b"\r")
+    if line_feeds == 0 and carriage_returns == 0:
+        return "none"
+    if carriage_returns == 0:
+        return "lf"
+    if line_feeds == carriage_returns == source_data.count(b"\r\n"):
+        return "crlf"
+    return "mixed"
+
+# Whether writing the file in text mode gives back the same bytes
+def keeps_newlines(newlines):
+    return newlines in ("none", "crlf" if os.linesep == "\r\n" else "lf")
+
+# Target files of the index with at least one site that "plan" (an "EditPlan") would write differently, either because its augments
+# change or because its arguments are not written the way this tool writes them
+# Plans that apply the same masks everywhere are answered by SQLite, the others go through the sites of each file
+def find_changed_files(connection, plan):
+    masks = plan.global_masks()
+    if masks is not None:
+        first_set, first_clear, second_set, second_clear = masks
+        rows = connection.execute(
+            "SELECT DISTINCT files.path FROM sites JOIN files ON files.id = sites.file_id "
+            "WHERE NOT sites.canonical "
+            "OR ((sites.first_augs & ~:first_clear) | :first_set) != sites.first_augs "
+            "OR ((sites.second_augs & ~:second_clear) | :second_set) != sites.second_augs",
+            {"first_set": first_set, "first_clear": first_clear, "second_set": second_set, "second_clear": second_clear}
+        )
+        return {path for path, in rows}
+
+    changed_paths = set()
+    file_plans = {}
+    for path, unit, first_augs, second_augs, canonical in connection.execute(
+            "SELECT files.path, sites.unit, sites.first_augs, sites.second_augs, sites.canonical FROM sites JOIN files ON files.id = sites.file_id"):
+        if path in changed_paths:
+            continue
+        if not canonical:
+            changed_paths.add(path)
+            continue
+
+        file_plan = file_plans.get(path)
+        if file_plan is None:
+            file_plan = file_plans[path] = plan.for_path(path)
+        first_set, first_clear, second_set, second_clear = file_plan.masks_for(unit)
+        if apply_masks(first_augs, first_set, first_clear) != first_augs or apply_masks(second_augs, second_set, second_clear) != second_augs:
+            changed_paths.add(path)
+
+    return changed_paths
+
+# Returns the (newlines, hash) of an indexed file, or None when it's not in the index
+def find_file(connection, relative_path):
+    return connection.execute("SELECT newlines, hash FROM files WHERE path = ?", (relative_path,)).fetchone()
+
+# The log objects "find_edit_spans" would give for a file none of whose sites change
+def build_unchanged_log_objects(connection, relative_path, source_path):
+    file_id, total_entries = connection.execute("SELECT id, total_entries FROM files WHERE path = ?", (relative_path,)).fetchone()
+
+    unchanged_entries = []
+    for unit, first_augs, second_augs in connection.execute(
+            "SELECT unit, first_augs, second_augs FROM sites WHERE file_id = ? ORDER BY start", (file_id,)):
+        unchanged_entries.append({
+            "unit": f"{unit}",
+            "unpacked": {
+                "btl_atel_set_ability": f"{convert_dec_to_compatible_hex(first_augs)}, {convert_dec_to_compatible_hex(second_augs)}",
+                "first_arg_augments": list(decode_augments(first_augs, FirstAugment)),
+                "second_arg_augments": list(decode_augments(second_augs, SecondAugment))
+            }
+        })
+
+    return [{
+        "path": source_path,
+        "total_entries": total_entries,
+        "edited_entries": {
+            "total": 0,
+            "entries": []
+        },
+        "unchanged_entries": {
+            "total": len(unchanged_entries),
+            "entries": unchanged_entries
+        }
+    }]
+
+# Every site whose augments include all the bits of the masks, optionally only for one unit
+def find_sites(connection, first_mask=0, second_mask=0, unit=None):
+    query = ("SELECT files.path, sites.entry, sites.unit, sites.start, sites.end, sites.first_augs, sites.second_augs "
+             "FROM sites JOIN files ON files.id = sites.file_id "
+             "WHERE (sites.first_augs & :first_mask) = :first_mask AND (sites.second_augs & :second_mask) = :second_mask")
+    if unit is not None:
+        query += " AND sites.unit = :unit"
+    query += " ORDER BY files.path, sites.start"
+    return connection.execute(query, {"first_mask": first_mask, "second_mask": second_mask, "unit": unit}).fetchall()
+
+# Units that have all the augments, like "which units have SAFETY"
+def find_units_with(connection, aug_enums):
+    first_mask, second_mask = augment_masks(aug_enums)
+    return sorted({unit for _, _, unit, _, _, _, _ in find_sites(connection, first_mask, second_mask)})
+
+# Command line of the index, also run by the "index" command of "cli" with the arguments that follow it
+# Returns the exit code, 2 for unknown augments like for invalid arguments
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Index every btlAtelSetAbility site of the unpacked files and query it.")
+    parser.add_argument("--index", default=default_index_path, help="SQLite file of the index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = subparsers.add_parser("update", help="Index the files that changed since the last update")
+    update_parser.add_argument("--input", default="unpacked")
+    update_parser.add_argument("--target", default="section_000.c")
+
+    units_parser = subparsers.add_parser("units", help="List the units that have all the given augments")
+    units_parser.add_argument("augments", nargs="+")
+
+    sites_parser = subparsers.add_parser("sites", help="List the sites of a unit, optionally only the ones with all the given augments")
+    sites_parser.add_argument("--unit", type=int)
+    sites_parser.add_argument("augments", nargs="*")
+
+    args = parser.parse_args(argv)
+    connection = open_index(args.index)
+
+    try:
+        if args.command == "update":
+            summary = update_index(connection, args.input, args.target)
+            print(f"Indexed {summary['indexed']} files, {summary['unchanged']} unchanged, {summary['removed']} removed")
+        elif args.command == "units":
+            aug_enums = [augment_from_name(aug_name) for aug_name in args.augments]
+            for unit in find_units_with(connection, aug_enums):
+                print(unit)
+        else:
+            first_mask, second_mask = selection_masks(args.augments)
+            for path, entry, unit, start, end, first_augs, second_augs in find_sites(connection, first_mask, second_mask, args.unit):
+                print(f"{path}:{start} {entry} unit {unit}: {convert_dec_to_compatible_hex(first_augs)}, {convert_dec_to_compatible_hex(second_augs)}")
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+    finally:
+        connection.close()
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
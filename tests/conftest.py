@@ -0,0 +1,83 @@
+import os
+import sys
+import random
+import pytest
+
+# The modules are at the top of the repository, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+target_filename = "section_000.c"
+
+# A small unpacked tree laid out like the game's, "battle/areaXX/scrXX", with a target file and two other files in each folder
+# Target files mix the shapes the scanner has to handle: negative and zero arguments, nested blocks, entries without abilities,
+# comments, and Windows or old Mac newlines with or without a BOM
+def build_unpacked(folder, areas=4, scripts=5, seed=0):
+    rng = random.Random(seed)
+    for area in range(areas):
+        for script in range(scripts):
+            script_folder = os.path.join(folder, "battle", f"area{area:02d}", f"scr{script:02d}")
+            os.makedirs(script_folder)
+
+            section = build_section(rng)
+            newline = rng.choice(["\n", "\n", "\r\n", "\r"])
+            data = section.replace("\n", newline).encode("utf-8")
+            if rng.random() < 0.2:
+                data = b"\xef\xbb\xbf" + data
+            with open(os.path.join(script_folder, target_filename), "wb") as target_file:
+                target_file.write(data)
+
+            with open(os.path.join(script_folder, "section_001.c"), "w", encoding="utf-8") as other_file:
+                other_file.write("    function entry00()\n    {\n        wait(1);\n    }\n" * rng.randint(1, 5))
+            with open(os.path.join(script_folder, "data.bin"), "wb") as data_file:
+                data_file.write(rng.randbytes(rng.randint(0, 512)))
+
+def build_section(rng):
+    parts = ["// Decompiled section\nscript main(0)\n{\n"]
+    for index in range(rng.randint(0, 6)):
+        parts.append(f"    function entry{index:02d}()\n    {{\n")
+        for _ in range(rng.choice((1, 1, 2))):
+            parts.append(f"        btlAtelSetUnit({rng.randint(0, 40)});\n")
+            if rng.random() < 0.2:
+                parts.append("        if (btlGetFlag(1))\n        {\n            wait(1);\n        }\n")
+            if rng.random() < 0.85:
+                parts.append(f"        btlAtelSetAbility({build_argument(rng)}, {build_argument(rng)});\n")
+        parts.append("        return;\n    }\n")
+    parts.append("}\n")
+    return "".join(parts)
+
+def build_argument(rng):
+    if rng.random() < 0.15:
+        return "0"
+    if rng.random() < 0.3:
+        return f"-0x{rng.getrandbits(31) or 1:x}"
+    return f"0x{rng.getrandbits(32):08x}"
+
+# Every file under "folder" and its bytes, keyed by its path relative to it, without the files a run writes next to the outputs
+def read_tree(folder, skipped_filenames=("log.json", "log.jsonl", "manifest.json", "manifest.updates.jsonl", "run_stats.json", "undo_journal.bin")):
+    tree = {}
+    for current_folder, _, filenames in os.walk(folder):
+        for filename in filenames:
+            if filename in skipped_filenames:
+                continue
+            path = os.path.join(current_folder, filename)
+            with open(path, "rb") as file:
+                tree[os.path.relpath(path, folder).replace(os.sep, "/")] = file.read()
+    return tree
+
+# Counts the files done, so "should_cancel" can stop a run after "count" of them
+class CancelAfter:
+    def __init__(self, count):
+        self.count = count
+        self.done = 0
+
+    def progress(self, done, total, source_path):
+        self.done = done
+
+    def should_cancel(self):
+        return self.done >= self.count
+
+@pytest.fixture
+def input_folder(tmp_path):
+    folder = str(tmp_path / "unpacked")
+    build_unpacked(folder)
+    return folder
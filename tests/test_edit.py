@@ -0,0 +1,45 @@
+import pytest
+from conftest import read_tree, target_filename
+from main import apply_edit_plan
+from plan import EditPlan
+
+plan = EditPlan.from_selection(["SAFETY", "STONESKIN"], True)
+
+# The workers and the pipeline only change how the files are scheduled, never what's written
+@pytest.mark.parametrize("workers, pipeline_depth", [(3, 4), (1, 4)])
+def test_output_matches_serial_run(input_folder, tmp_path, workers, pipeline_depth):
+    serial_folder = str(tmp_path / "serial")
+    apply_edit_plan(input_folder, serial_folder, target_filename, plan, 1, pipeline_depth=0)
+
+    output_folder = str(tmp_path / "edited")
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, plan, workers, pipeline_depth=pipeline_depth)
+
+    assert summary["edited"] == 20
+    assert read_tree(output_folder) == read_tree(serial_folder)
+    with open(f"{output_folder}/log.jsonl", "rb") as log_file, open(f"{serial_folder}/log.jsonl", "rb") as serial_log_file:
+        assert log_file.read() == serial_log_file.read()
+
+def test_edit_changes_only_target_files(input_folder, tmp_path):
+    output_folder = str(tmp_path / "edited")
+    apply_edit_plan(input_folder, output_folder, target_filename, plan)
+
+    source_tree = read_tree(input_folder)
+    output_tree = read_tree(output_folder)
+    assert output_tree.keys() == source_tree.keys()
+    assert all(output_tree[path] == data for path, data in source_tree.items() if not path.endswith(target_filename))
+    assert any(output_tree[path] != data for path, data in source_tree.items() if path.endswith(target_filename))
+
+# Skipped files are copied from the last run, so an incremental run gives what a full one would
+def test_incremental_run_matches_full_run(input_folder, tmp_path):
+    output_folder = str(tmp_path / "edited")
+    apply_edit_plan(input_folder, output_folder, target_filename, plan, incremental=True)
+
+    changed_path = f"{input_folder}/battle/area01/scr02/{target_filename}"
+    with open(changed_path, "ab") as changed_file:
+        changed_file.write(b"function entry99()\n{\n    btlAtelSetUnit(7);\n    btlAtelSetAbility(0x10, 0);\n}\n")
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, plan, incremental=True)
+    assert summary["edited"] == 1
+
+    full_folder = str(tmp_path / "full")
+    apply_edit_plan(input_folder, full_folder, target_filename, plan)
+    assert read_tree(output_folder) == read_tree(full_folder)
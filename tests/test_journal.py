@@ -0,0 +1,59 @@
+import os
+import pytest
+from conftest import read_tree, target_filename, CancelAfter
+from main import apply_edit_plan
+from plan import EditPlan
+from journal import revert_journal, journal_filename
+
+add_safety = EditPlan.from_selection(["SAFETY"], True)
+add_stoneskin = EditPlan.from_selection(["STONESKIN"], True)
+
+def assert_reverted(input_folder, output_folder):
+    summary = revert_journal(output_folder)
+    assert summary["failed"] == []
+    assert read_tree(output_folder) == read_tree(input_folder)
+    assert not os.path.isfile(os.path.join(output_folder, journal_filename))
+    return summary
+
+def test_revert_after_edit(input_folder, tmp_path):
+    output_folder = str(tmp_path / "edited")
+    apply_edit_plan(input_folder, output_folder, target_filename, add_safety)
+    source_tree = read_tree(input_folder)
+    modified_files = sum(data != source_tree[path] for path, data in read_tree(output_folder).items())
+    assert modified_files > 0
+
+    summary = assert_reverted(input_folder, output_folder)
+    assert summary["reverted"] == modified_files
+
+# Files the incremental run skipped keep the journal records of the run before
+def test_revert_after_incremental_run(input_folder, tmp_path):
+    output_folder = str(tmp_path / "edited")
+    apply_edit_plan(input_folder, output_folder, target_filename, add_safety, incremental=True)
+
+    changed_path = os.path.join(input_folder, "battle", "area02", "scr03", target_filename)
+    with open(changed_path, "ab") as changed_file:
+        changed_file.write(b"function entry99()\n{\n    btlAtelSetUnit(7);\n    btlAtelSetAbility(-0x10, 0);\n}\n")
+    added_folder = os.path.join(input_folder, "battle", "area09", "scr00")
+    os.makedirs(added_folder)
+    with open(os.path.join(added_folder, target_filename), "wb") as added_file:
+        added_file.write(b"function entry00()\n{\n    btlAtelSetUnit(3);\n    btlAtelSetAbility(0, 0x20);\n}\n")
+
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, add_safety, incremental=True)
+    assert (summary["edited"], summary["skipped"]) == (2, 59)
+
+    assert_reverted(input_folder, output_folder)
+
+# The files the workers or the pipeline had already written when the run was cancelled are journaled too,
+# the others still hold the first edit and keep its records
+@pytest.mark.parametrize("workers, pipeline_depth", [(1, 0), (1, 4), (3, 4)])
+def test_revert_after_cancelled_run(input_folder, tmp_path, workers, pipeline_depth):
+    output_folder = str(tmp_path / "edited")
+    apply_edit_plan(input_folder, output_folder, target_filename, add_safety, workers, pipeline_depth=pipeline_depth)
+
+    cancel_after = CancelAfter(20)
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, add_stoneskin, workers, progress_callback=cancel_after.progress,
+                              should_cancel=cancel_after.should_cancel, pipeline_depth=pipeline_depth)
+    assert summary["cancelled"]
+    assert 0 < summary["edited"] < 20
+
+    assert_reverted(input_folder, output_folder)
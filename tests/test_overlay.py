@@ -0,0 +1,55 @@
+import os
+import json
+import pytest
+from conftest import read_tree, target_filename, CancelAfter
+from main import apply_edit_plan
+from plan import EditPlan
+from overlay import overlay_manifest_filename
+
+plan = EditPlan.from_selection(["SAFETY"], True)
+
+def overlay_tree(output_folder):
+    return read_tree(output_folder, skipped_filenames=("log.json", "log.jsonl", "run_stats.json", overlay_manifest_filename))
+
+def normalize_newlines(data):
+    return data.removeprefix(b"\xef\xbb\xbf").replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+def listed_files(output_folder):
+    with open(os.path.join(output_folder, overlay_manifest_filename), "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)["files"]
+
+def test_overlay_writes_only_modified_targets(input_folder, tmp_path):
+    output_folder = str(tmp_path / "overlay")
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, plan, output_mode="overlay")
+
+    mirror_folder = str(tmp_path / "mirror")
+    apply_edit_plan(input_folder, mirror_folder, target_filename, plan)
+    source_tree = read_tree(input_folder)
+    mirror_tree = read_tree(mirror_folder)
+
+    # Overlays keep the newlines of the source, the mirror may not
+    written = overlay_tree(output_folder)
+    assert len(written) == summary["modified"] > 0
+    assert written.keys() == listed_files(output_folder).keys()
+    for path, data in written.items():
+        assert data != source_tree[path]
+        assert normalize_newlines(data) == normalize_newlines(mirror_tree[path])
+    assert all(normalize_newlines(mirror_tree[path]) == normalize_newlines(data) for path, data in source_tree.items() if path not in written)
+
+# Every file the workers or the pipeline wrote before the run stopped is in the manifest, so the next run can remove it
+@pytest.mark.parametrize("workers, pipeline_depth", [(1, 0), (1, 4), (3, 4)])
+def test_overlay_manifest_after_cancelled_run(input_folder, tmp_path, workers, pipeline_depth):
+    output_folder = str(tmp_path / "overlay")
+    cancel_after = CancelAfter(5)
+    summary = apply_edit_plan(input_folder, output_folder, target_filename, plan, workers, progress_callback=cancel_after.progress,
+                              should_cancel=cancel_after.should_cancel, output_mode="overlay", pipeline_depth=pipeline_depth)
+    assert summary["cancelled"]
+    assert overlay_tree(output_folder).keys() == listed_files(output_folder).keys()
+
+    # The next run removes what the cancelled one wrote and its plan doesn't modify
+    empty_plan = EditPlan([])
+    apply_edit_plan(input_folder, output_folder, target_filename, empty_plan, output_mode="overlay")
+    fresh_folder = str(tmp_path / "fresh")
+    apply_edit_plan(input_folder, fresh_folder, target_filename, empty_plan, output_mode="overlay")
+    assert overlay_tree(output_folder) == overlay_tree(fresh_folder)
+    assert listed_files(output_folder) == listed_files(fresh_folder)
@@ -0,0 +1,68 @@
+import random
+import pytest
+from conftest import read_tree, target_filename
+from main import apply_edit_plan
+from plan import EditPlan, PlanOperation, plan_from_dict, parse_units, units_contain, compose_masks, apply_masks
+
+plan_data = {
+    "operations": [
+        {"action": "remove", "augments": ["SAFETY", "ACCURACY_BOOST"]},
+        {"action": "add", "augments": ["SAFETY", "MUFFLE"], "units": ["10-30"]},
+        {"action": "add", "augments": ["STABILITY"], "paths": ["battle/area01/*", "battle/area03/scr0[0-2]/*"]},
+        {"action": "remove", "augments": ["MUFFLE"], "units": [12, "20-22"], "paths": "battle/area0[0-1]/*"}
+    ]
+}
+
+# The composed masks of a site give what applying each operation in turn gives
+def test_compose_masks_matches_operations_in_order():
+    rng = random.Random(0)
+    for _ in range(2000):
+        operations = [PlanOperation(rng.choice(("add", "remove")), rng.getrandbits(32), rng.getrandbits(32), None, None) for _ in range(rng.randint(0, 5))]
+        first_bitfield, second_bitfield = rng.getrandbits(32), rng.getrandbits(32)
+
+        first_set, first_clear, second_set, second_clear = compose_masks(operations)
+        expected_first, expected_second = first_bitfield, second_bitfield
+        for operation in operations:
+            if operation.action == "add":
+                expected_first, expected_second = expected_first | operation.first_mask, expected_second | operation.second_mask
+            else:
+                expected_first, expected_second = expected_first & ~operation.first_mask, expected_second & ~operation.second_mask
+
+        assert apply_masks(first_bitfield, first_set, first_clear) == expected_first
+        assert apply_masks(second_bitfield, second_set, second_clear) == expected_second
+
+# A whole plan in one run writes what running its operations one after the other, each on the output of the last, writes
+def test_plan_matches_operations_run_in_order(input_folder, tmp_path):
+    plan = plan_from_dict(plan_data)
+    output_folder = str(tmp_path / "plan")
+    apply_edit_plan(input_folder, output_folder, target_filename, plan)
+
+    current_folder = input_folder
+    for number, operation in enumerate(plan.operations):
+        next_folder = str(tmp_path / f"operation{number}")
+        apply_edit_plan(current_folder, next_folder, target_filename, EditPlan([operation]))
+        current_folder = next_folder
+
+    assert read_tree(output_folder) == read_tree(current_folder)
+
+def test_parse_units_merges_ranges():
+    assert parse_units([3, "12-40", "10-13", 41, "5"]) == ((3, 3), (5, 5), (10, 41))
+    assert parse_units("0-100000000") == ((0, 100000000),)
+
+    unit_ranges = parse_units([3, "12-40"])
+    assert [unit for unit in range(45) if units_contain(unit_ranges, unit)] == [3] + list(range(12, 41))
+
+@pytest.mark.parametrize("units", ["40-12", "5-", "-3", "a", -1, True, [], [3, None]])
+def test_parse_units_rejects_invalid_units(units):
+    with pytest.raises(ValueError):
+        parse_units(units)
+
+@pytest.mark.parametrize("operation", [
+    {"action": "add", "augments": ["SAFETY"], "paths": []},
+    {"action": "add", "augments": []},
+    {"action": "add", "augments": ["NOT_AN_AUGMENT"]},
+    {"action": "toggle", "augments": ["SAFETY"]}
+])
+def test_plan_from_dict_rejects_invalid_operations(operation):
+    with pytest.raises(ValueError):
+        plan_from_dict({"operations": [operation]})
@@ -0,0 +1,69 @@
+import os
+import sys
+import pytest
+from conftest import build_unpacked, read_tree, target_filename
+
+pytest.importorskip("PyQt5")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+import window
+from main import apply_edit_plan
+from plan import EditPlan
+
+selected_augs = ["SAFETY", "STONESKIN"]
+
+@pytest.fixture
+def main_window(tmp_path, monkeypatch):
+    # The window edits "unpacked" into "edited", next to where it runs
+    build_unpacked(str(tmp_path / "unpacked"))
+    os.makedirs(tmp_path / "edited")
+    monkeypatch.chdir(tmp_path)
+
+    # The dialogs would block until closed, so they only record what they were given
+    shown = []
+    monkeypatch.setattr(window.MainWindow, "show_summary", lambda self, icon, message, summary: shown.append(("summary", message, summary)))
+    monkeypatch.setattr(window.MainWindow, "show_preview", lambda self, summary: shown.append(("preview", None, summary)))
+
+    # PyQt5 aborts when a slot raises unless "sys.excepthook" is replaced, this makes it fail the test instead
+    errors = []
+    monkeypatch.setattr(sys, "excepthook", lambda error_type, error, traceback: errors.append(error))
+
+    app = QApplication.instance() or QApplication([])
+    main_window = window.MainWindow()
+    for checkbox in main_window.checkboxes:
+        checkbox.setChecked(checkbox.text() in selected_augs)
+    yield main_window, shown
+    main_window.deleteLater()
+    app.processEvents()
+    assert errors == []
+
+# Starts an edit like the buttons do, then waits for its worker and delivers the signals it queued for the window
+def run_edit(main_window, dry_run):
+    main_window.process_edit_augments("edited", dry_run=dry_run)
+    edit_worker = main_window.edit_worker
+    assert edit_worker is not None and not main_window.edit_button.isEnabled()
+    assert edit_worker.wait(60000)
+    QApplication.processEvents()
+    assert main_window.edit_worker is None and main_window.edit_button.isEnabled()
+
+def test_preview_writes_nothing(main_window, tmp_path):
+    main_window, shown = main_window
+    run_edit(main_window, dry_run=True)
+
+    [(kind, _, summary)] = shown
+    assert kind == "preview"
+    assert summary["changed"] > 0 and not summary["cancelled"]
+    assert os.listdir(tmp_path / "edited") == []
+
+def test_edit_matches_engine_run(main_window, tmp_path):
+    main_window, shown = main_window
+    run_edit(main_window, dry_run=False)
+
+    [(kind, message, summary)] = shown
+    assert kind == "summary" and message.startswith("Augments added!")
+    assert summary["edited"] == 20 and not summary["cancelled"]
+
+    engine_folder = str(tmp_path / "engine")
+    apply_edit_plan(str(tmp_path / "unpacked"), engine_folder, target_filename, EditPlan.from_selection(selected_augs, True))
+    assert read_tree(str(tmp_path / "edited")) == read_tree(engine_folder)
@@ -0,0 +1,135 @@
+import os
+import time
+import logging
+from main import apply_edit_plan, apply_edit_plan_to_paths
+from manifest import load_manifest
+
+logger = logging.getLogger(__name__)
+
+# The (size, mtime_ns) of every file under "folder", keyed by its path relative to it
+# Re-extracting or saving a file changes at least one of them, which is what the incremental manifest checks too
+def snapshot_folder(folder):
+    snapshot = {}
+    folders = [folder]
+    while folders:
+        current_folder = folders.pop()
+        try:
+            entries = list(os.scandir(current_folder))
+        except FileNotFoundError:
+            # Removed while it was being walked, the next poll sees the rest
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                else:
+                    entry_stat = entry.stat()
+                    snapshot[os.path.relpath(entry.path, folder)] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+    return snapshot
+
+# The paths that were added or changed and the ones that were removed between two snapshots
+def diff_snapshots(old_snapshot, new_snapshot):
+    changed = [path for path, file_state in new_snapshot.items() if old_snapshot.get(path) != file_state]
+    removed = [path for path in old_snapshot if path not in new_snapshot]
+    return changed, removed
+
+# Size of the log objects the manifest points at, the rest of "log.jsonl" are objects later batches replaced
+def live_log_size(manifest):
+    return sum(entry.get("log_length", 0) for entry in manifest.values())
+
+# Keeps "output_folder" up to date with "input_folder" by polling it every "interval" seconds, applying the same "plan" every time
+# Changes are batched until nothing changed for "debounce" seconds, so re-extracting a whole folder is a single run
+# Each batch only edits or copies the files that changed and removes the outputs of the removed ones (see "apply_edit_plan_to_paths"),
+# so its cost follows the size of the change instead of the size of the tree
+# Batches append to the log, the manifest and the journal, and once the log objects they replaced outweigh the live ones
+# an incremental "apply_edit_plan" writes them all again, which costs about as much as the batches that grew them
+# Polling needs nothing outside the standard library and works the same on every system and on network drives
+# Runs until "should_stop()" returns True, "on_batch(batch)" is called after each batch with what it changed and its timings,
+# and the latency of each batch, from the poll that first saw a change to the output being written, is logged
+# Returns the batches run, after the first run that brings the output folder up to date
+def watch_folder(input_folder, output_folder, target_filename, plan, workers=1, interval=1.0, debounce=0.5, passthrough="auto",
+                 pretty_log=False, index_path=None, should_stop=None, on_batch=None):
+    batches = []
+
+    snapshot = snapshot_folder(input_folder)
+    apply_edit_plan(input_folder, output_folder, target_filename, plan, workers, True, passthrough, pretty_log=pretty_log, index_path=index_path)
+    manifest, log_size = load_manifest(output_folder, input_folder, target_filename)
+    live_size = live_log_size(manifest)
+    logger.info(f"Watching {input_folder} for changes, every {interval:g}s")
+
+    pending_changed = set()
+    pending_removed = set()
+    first_change_time = None
+    last_change_time = None
+
+    while should_stop is None or not should_stop():
+        # While a batch is pending, poll often enough to notice when it settles
+        time.sleep(min(interval, debounce) if first_change_time is not None else interval)
+
+        new_snapshot = snapshot_folder(input_folder)
+        changed, removed = diff_snapshots(snapshot, new_snapshot)
+        snapshot = new_snapshot
+        now = time.perf_counter()
+
+        if changed or removed:
+            pending_changed.update(changed)
+            pending_changed.difference_update(removed)
+            pending_removed.update(removed)
+            pending_removed.difference_update(changed)
+            if first_change_time is None:
+                first_change_time = now
+            last_change_time = now
+            continue
+
+        if first_change_time is None or now - last_change_time < debounce:
+            continue
+
+        run_start = time.perf_counter()
+        changed = sorted(pending_changed)
+        removed = sorted(pending_removed)
+        batch_paths = changed + removed
+        try:
+            live_size -= sum(manifest.get(relative_path, {}).get("log_length", 0) for relative_path in batch_paths)
+            summary = apply_edit_plan_to_paths(input_folder, output_folder, target_filename, plan, changed, removed, manifest, workers, passthrough, pretty_log)
+            live_size += sum(manifest.get(relative_path, {}).get("log_length", 0) for relative_path in batch_paths)
+            log_size = summary["log_size"]
+
+            compacted = log_size - live_size > live_size
+            if compacted:
+                apply_edit_plan(input_folder, output_folder, target_filename, plan, workers, True, passthrough, pretty_log=pretty_log, index_path=index_path)
+                manifest, log_size = load_manifest(output_folder, input_folder, target_filename)
+                live_size = live_log_size(manifest)
+        except OSError:
+            # A file that's still being written, locked or gone, or a full disk, shouldn't end the watch
+            # The batch left the manifest it was given half updated, so it's read again from what was saved,
+            # and its paths stay pending to be tried again once the folder is quiet for another "debounce"
+            logger.exception(f"Batch of {len(changed)} changed and {len(removed)} removed files failed, trying again")
+            manifest, log_size = load_manifest(output_folder, input_folder, target_filename)
+            live_size = live_log_size(manifest)
+            last_change_time = time.perf_counter()
+            continue
+        done_time = time.perf_counter()
+
+        batch = {
+            "changed": changed,
+            "removed": removed,
+            "edited": summary["edited"],
+            "copied": summary["copied"],
+            "compacted": compacted,
+            "run_time": done_time - run_start,
+            "latency": done_time - first_change_time
+        }
+        batches.append(batch)
+        logger.info(f"{len(batch['changed'])} files changed and {len(batch['removed'])} removed: edited {batch['edited']}, copied {batch['copied']} "
+                    f"in {batch['run_time']:.2f}s, {batch['latency']:.2f}s after the first change" + (", log compacted" if compacted else ""))
+        if on_batch is not None:
+            on_batch(batch)
+
+        pending_changed = set()
+        pending_removed = set()
+        first_change_time = None
+        last_change_time = None
+
+    return batches
@@ -1,11 +1,50 @@
 import sys
 import os
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QRadioButton, QGridLayout, QCheckBox, QPushButton, QFrame, QMessageBox, QLabel
-from augments import FirstAugment, SecondAugment
-from main import find_and_edit_files
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QRadioButton, QGridLayout, QCheckBox, QPushButton, QFrame, QMessageBox, QLabel, QProgressBar, QDialog, QPlainTextEdit, QDialogButtonBox
+from augments import augment_registry
+from plan import EditPlan
+from main import apply_edit_plan
+from instrumentation import format_stats_table
 from version import __version__
 
+# Runs "apply_edit_plan" away from the event thread, so the window keeps responding during the edit
+# With "dry_run" it only previews the edit, see "preview_edit_plan"
+class EditWorker(QThread):
+    progress = pyqtSignal(int, int)
+    edit_finished = pyqtSignal(object)
+    edit_failed = pyqtSignal(str)
+
+    def __init__(self, input_folder, output_folder, target_filename, plan, should_add, workers, dry_run=False):
+        super().__init__()
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.target_filename = target_filename
+        self.plan = plan
+        self.should_add = should_add
+        self.workers = workers
+        self.dry_run = dry_run
+        self.cancelled = False
+
+    def run(self):
+        try:
+            summary = apply_edit_plan(self.input_folder, self.output_folder, self.target_filename, self.plan, self.workers, incremental=True,
+                                      progress_callback=self.report_progress, should_cancel=self.is_cancelled, dry_run=self.dry_run)
+        except Exception as error:
+            self.edit_failed.emit(str(error))
+        else:
+            self.edit_finished.emit(summary)
+
+    def report_progress(self, done, total, source_path):
+        self.progress.emit(done, total)
+
+    # Called from the event thread, the edit stops before its next file
+    def cancel(self):
+        self.cancelled = True
+
+    def is_cancelled(self):
+        return self.cancelled
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -41,7 +80,8 @@ class MainWindow(QMainWindow):
         self.grid_frame = QFrame()
         self.grid_layout = QGridLayout(self.grid_frame)
         
-        self.items = list(FirstAugment) + list(SecondAugment)
+        # The registry has the checkboxes in order, with their tooltips
+        self.items = list(augment_registry.values())
         
         col_count = 4
         self.checkboxes = []
@@ -51,11 +91,9 @@ class MainWindow(QMainWindow):
             col = index % col_count
             
             checkbox = QCheckBox(item.name)
+            checkbox.setToolTip(item.tooltip)
             self.grid_layout.addWidget(checkbox, row, col)
             self.checkboxes.append(checkbox)
-
-        for checkbox in self.checkboxes:
-            self.add_checkbox_tooltip(checkbox)
         
         self.layout.addWidget(self.grid_frame)
         
@@ -63,6 +101,26 @@ class MainWindow(QMainWindow):
         self.layout.addWidget(self.edit_button)
         
         self.edit_button.clicked.connect(self.edit_button_clicked)
+
+        self.preview_button = QPushButton("Preview Changes")
+        self.layout.addWidget(self.preview_button)
+
+        self.preview_button.clicked.connect(self.preview_button_clicked)
+
+        self.progress_layout = QHBoxLayout()
+
+        self.progress_bar = QProgressBar()
+        self.progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_button_clicked)
+        self.progress_layout.addWidget(self.cancel_button)
+
+        self.layout.addLayout(self.progress_layout)
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+
+        self.edit_worker = None
         
         self.grid_frame.setStyleSheet("background-color: rgb(211, 211, 211);")
 
@@ -78,88 +136,6 @@ class MainWindow(QMainWindow):
             for checkbox in self.checkboxes:
                 checkbox.setChecked(False)
 
-    def add_checkbox_tooltip(self, checkbox):
-        tooltip_text = self.get_tooltip_text(checkbox.text()) 
-        checkbox.setToolTip(tooltip_text)
-
-    def get_tooltip_text(self, checkbox_text):
-        first_augment_tooltips = {
-            "STABILITY": "Prevents Knockback.",
-            "SAFETY": "Prevents Instant Death, Warp and the like.",
-            "ACCURACY_BOOST": "Improves chance to hit. (Ignore/Null Evade)",
-            "SHIELD_BOOST": "Improves chance to block with a shield",
-            "EVASION_BOOST": "Improvse chance of avoiding attacks.",
-            "LAST_STAND": "Increases defense when HP Critical.",
-            "COUNTER": "When attacked, automatically counter with weapon in hand. (Enables Counter)",
-            "COUNTER_BOOST": "Improves chance to counter. (Gengi Gloves Effect)",
-            "SPELLBREAKER": "Increases magick power when HP Critical.",
-            "BRAWLER": "Increases attack power when fighting empty-handed.",
-            "ADRENALINE": "Increases strength when HP Critical.",
-            "FOCUS": "Increases strength when HP is full.",
-            "LOBBYING": "Convert all license points earned to gil. (Cat Ear Hood Effect)",
-            "COMBO_BOOST": "Improves chance of scoring multiple hits.",
-            "ITEM_BOOST": "Improves potency of restorative items and fangs. (Pheasant Netsuke Effect)",
-            "MEDICINE_REVERSE": "Reverses effects of restorative items such as potions. (Nihopalaoa Effect)",
-            "WEATHERPROOF": "Nullifies weather and terrain effects. (Agate Ring Effect)",
-            "THIEVERY": "Enables the theft of superior and rare items. (Thief Cuffs Effect)",
-            "SABOTEUR": "Improves chance to strike with magicks. (Ignore/Null Vit | Indigo Pendant Effect)",
-            "MAGICK_LORE_1": "Increases magick potency.",
-            "WARMAGE": "Gain MP after dealing magick damage.",
-            "MARTYR": "Gain MP after taking damage.",
-            "MAGICK_LORE_2": "Increases magick potency.",
-            "HEADSMAN": "Gain MP after defeating a foe.",
-            "MAGICK_LORE_3": "Increases magick potency.",
-            "TREASURE_HUNTER": "Search the deepest recesses of chests, coffers, and the like. (Diamond Armlet Effect)",
-            "MAGICK_LORE_4": "Increases magick potency.",
-            "DOUBLE_EXP": "Doubles EXP earned. (Embroidered Tipped Effect)",
-            "DOUBLE_LP": "Doubles license points earned. (Golden Amulet Effect)",
-            "NO_EXP": "Reduces EXP earned to 0. (Firefly Effect)",
-            "SPELLBOUND": "Increases duration of status effects.",
-            "PIERCING_MAGICK": "Magicks will not bounce off targets with Reflect status. (Opal Ring Effect)"
-        }
-        
-        second_augment_tooltips = {
-            "OFFERING": "Enables casting of magicks with gil, rather than MP. (Turtleshell Choker Effect)",
-            "MUFFLE": "Avoid detection based on sound and magick.",
-            "LIFE_CLOAK": "Avoid detection based on low HP.",
-            "BATTLE_LORE_1": "Increases physical attack damage.",
-            "PARSIMONY": "Reduces MP costs by half.",
-            "TREAD_LIGHTLY": "Move safely past traps. (Steel Polyens Effect)",
-            "UNUSED": "",
-            "EMPTINESS": "Reduces max MP to 0.",
-            "RESIST_PIERCE_DAMAGE": "Ignores the piercing effects of Guns and the like.",
-            "ANTI_LIBRA": "Hides user's vital information from the effect of Libra.",
-            "BATTLE_LORE_2": "Increases physical attack damage.",
-            "BATTLE_LORE_3": "Increases physical attack damage.",
-            "BATTLE_LORE_4": "Increases physical attack damage.",
-            "BATTLE_LORE_5": "Increases physical attack damage.",
-            "BATTLE_LORE_6": "Increases physical attack damage.",
-            "BATTLE_LORE_7": "Increases physical attack damage.",
-            "STONESKIN": "Reduces damage taken by 30%.",
-            "ATTACK_BOOST": "Increases Attack damage by 20%.",
-            "DOUBLE_EDGED": "Increases Attack damage by 50% and user receives damage equal to each Attack.",
-            "SPELLSPRING": "Reduces MP costs to 0.",
-            "ELEMENTAL_SHIFT": "User gains one elemental weakness and absorbs all others.",
-            "CELERITY": "Reduces Attack charge time to 0.",
-            "SWIFT_CAST": "Reduces Magick charge time to 0.",
-            "ATTACK_IMMUNITY": "User becomes immune to attacks.",
-            "MAGIC_IMMUNITY": "User becomes immune to magicks.",
-            "STATUS_IMMUNITY": "User becomes immune to statuses.",
-            "DAMAGE_SPIKES": "Returns 5% of all damage received to user's attackers.",
-            "SUICIDAL": "Compels nearby allies to use Self-Destruct.",
-            "BATTLE_LORE_8": "Increases physical attack damage.",
-            "BATTLE_LORE_9": "Increases physical attack damage.",
-            "BATTLE_LORE_10": "Increases physical attack damage.",
-            "BATTLE_LORE_11": "Increases physical attack damage."
-        }
-     
-        if checkbox_text in first_augment_tooltips:
-            return first_augment_tooltips[checkbox_text]
-        elif checkbox_text in second_augment_tooltips:
-            return second_augment_tooltips[checkbox_text]
-        else:
-            return "No tooltip available."
-        
     def edit_button_clicked(self):
         output_folder = "edited"
         files_in_directory = os.listdir(output_folder)
@@ -177,37 +153,135 @@ class MainWindow(QMainWindow):
         else:
             self.process_edit_augments(output_folder)
 
-    def process_edit_augments(self, output_folder):
-        selected_augs = [checkbox.text() for checkbox in self.checkboxes if checkbox.isChecked()]
+    # Nothing is written, so there's no need to warn about the edited files
+    def preview_button_clicked(self):
+        self.process_edit_augments("edited", dry_run=True)
+
+    def process_edit_augments(self, output_folder, dry_run=False):
+        self.selected_augs = [checkbox.text() for checkbox in self.checkboxes if checkbox.isChecked()]
         should_add = self.add_radio.isChecked()
         
-        self.edit_augments(output_folder, selected_augs, should_add)
+        self.edit_augments(output_folder, self.selected_augs, should_add, dry_run)
+
+    def edit_augments(self, output_folder, selected_augs, should_add, dry_run=False):
+        plan = EditPlan.from_selection(selected_augs, should_add)
 
-        if selected_augs:
+        input_folder = "unpacked"
+        target_filename = "section_000.c"
+        workers = os.cpu_count()
+
+        self.edit_worker = EditWorker(input_folder, output_folder, target_filename, plan, should_add, workers, dry_run)
+        self.edit_worker.progress.connect(self.edit_progressed)
+        self.edit_worker.edit_finished.connect(self.edit_finished)
+        self.edit_worker.edit_failed.connect(self.edit_failed)
+
+        self.set_editing(True)
+        self.edit_worker.start()
+
+    # Locks the selection while an edit runs and shows its progress
+    def set_editing(self, is_editing):
+        self.edit_button.setEnabled(not is_editing)
+        self.preview_button.setEnabled(not is_editing)
+        self.grid_frame.setEnabled(not is_editing)
+        self.add_radio.setEnabled(not is_editing)
+        self.remove_radio.setEnabled(not is_editing)
+        self.select_all_button.setEnabled(not is_editing)
+        self.deselect_all_button.setEnabled(not is_editing)
+
+        self.progress_bar.setVisible(is_editing)
+        self.cancel_button.setVisible(is_editing)
+        self.cancel_button.setEnabled(is_editing)
+
+        if is_editing:
+            self.progress_bar.setRange(0, 0) # Busy until the files are counted
+            self.progress_bar.setValue(0)
+
+    def edit_progressed(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def cancel_button_clicked(self):
+        if self.edit_worker is not None:
+            self.cancel_button.setEnabled(False)
+            self.edit_worker.cancel()
+
+    def edit_finished(self, summary):
+        self.set_editing(False)
+        dry_run = self.edit_worker.dry_run
+        should_add = self.edit_worker.should_add
+        self.edit_worker = None
+
+        if dry_run:
+            self.show_preview(summary)
+            return
+
+        done_files = summary["edited"] + summary["unchanged"] + summary["copied"] + summary["skipped"]
+        timing = f"{done_files} files in {summary['elapsed']:.1f}s ({summary['files_per_second']:.0f} files/s)"
+
+        if summary["cancelled"]:
+            self.show_summary(QMessageBox.Information, f"Edit cancelled after {done_files} of {summary['files']} files.", summary)
+        elif self.selected_augs:
             mode = "added" if should_add else "removed"
-            message = f"Augments {mode}!"
-            QMessageBox.information(self, "Info", message)
+            message = f"Augments {mode}!\n\n{timing}"
+            self.show_summary(QMessageBox.Information, message, summary)
         else:
-            QMessageBox.warning(self, "Info", "No items selected.")
+            self.show_summary(QMessageBox.Warning, f"No items selected.\n\n{timing}", summary)
 
-    def edit_augments(self, output_folder, selected_augs, should_add):
-        first_augs = []
-        second_augs = []
+    # The time of each stage and the counters of the run go in the details of the message
+    def show_summary(self, icon, message, summary):
+        message_box = QMessageBox(icon, "Info", message, QMessageBox.Ok, self)
+        message_box.setDetailedText(format_stats_table(summary["stats"], summary["elapsed"]))
+        message_box.exec_()
 
-        for aug_name in selected_augs:
-            first_aug = next((enum for enum in FirstAugment if enum.name == aug_name), None)
-            if first_aug != None:
-                first_augs.append(first_aug)
+    # Lists the augments each changed site would gain and lose, followed by the diff of the changed lines
+    def show_preview(self, summary):
+        lines = [f"{summary['sites']} sites would change in {summary['changed']} of {summary['files']} files"]
+        if summary["cancelled"]:
+            lines.append("Preview cancelled, only part of the files were checked")
+        lines.append("")
 
-            second_aug = next((enum for enum in SecondAugment if enum.name == aug_name), None)
-            if second_aug != None:
-                second_augs.append(second_aug)
+        for change in summary["changes"]:
+            lines.append(change["path"])
+            for site in change["sites"]:
+                added = "".join(f" +{augment}" for augment in site["added"])
+                removed = "".join(f" -{augment}" for augment in site["removed"])
+                lines.append(f"    unit {site['unit']}: {site['before']} -> {site['after']}{added}{removed}")
+        lines.append("")
+        lines.append(summary["diff"])
 
-        input_folder = "unpacked"
-        target_filename = "section_000.c"
-        find_and_edit_files(input_folder, output_folder, target_filename, first_augs, second_augs, should_add)
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Preview")
+        dialog.resize(800, 600)
+        dialog_layout = QVBoxLayout(dialog)
+
+        text_edit = QPlainTextEdit("\n".join(lines))
+        text_edit.setReadOnly(True)
+        text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        dialog_layout.addWidget(text_edit)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(dialog.reject)
+        dialog_layout.addWidget(button_box)
+
+        dialog.exec_()
+
+    def edit_failed(self, error):
+        self.set_editing(False)
+        self.edit_worker = None
+        QMessageBox.critical(self, "Error", f"Could not edit the augments: {error}")
+
+    # Closing the window stops a running edit instead of leaving it writing in the background
+    def closeEvent(self, event):
+        if self.edit_worker is not None:
+            self.edit_worker.cancel()
+            self.edit_worker.wait()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
+    # Only a frozen executable needs it, and importing "multiprocessing" slows down the start otherwise
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()